@@ -41,6 +41,11 @@ I18N_LIVE_RELOAD = (DEBUG and sys.platform in {"linux", "linux2"}) or os.getenv(
 # generate
 I18N_MAX_SENTENCES_PER_GROUP = 10
 
+# Translations with several variants are picked at random using a regular
+# pseudo-random generator. Set this to True to use the system's secure source
+# of randomness instead, at the cost of a system call for each choice.
+I18N_USE_SYSTEM_RANDOM = False
+
 # How long should a register lock last? Registers are locked when starting to
 # answer a message and freed when the response is sent. One minute sounds
 # reasonable.
@@ -60,6 +65,11 @@ JUMPING_TRIGGER_PENALTY = 0.8
 # Below this score, the trigger isn't considered valid
 MINIMAL_TRIGGER_SCORE = 0.3
 
+# How many triggers of a message can be ranked at the same time. Triggers
+# calling remote services (NLU APIs and so on) might otherwise hammer them
+# when there is a lot of transitions. None means no limit.
+MAX_CONCURRENT_TRIGGERS = None
+
 # This is the state that handles error messages in case no other state is
 # active (and something fails)
 DEFAULT_STATE = "bernard.engine.state.DefaultState"
@@ -104,6 +114,21 @@ CONTEXT_STORE = {
     "params": redis_params,
 }
 
+# Messages received for a conversation while a previous message of the same
+# conversation is still being handled are queued. If this is enabled, queued
+# messages made of a single text are merged together into one message, so a
+# user sending a burst of texts gets handled once instead of once per text.
+MERGE_QUEUED_TEXTS = False
+
+# Queued messages of a conversation are handled in bursts, the register being
+# locked for the whole burst and written once at the end of it. This is the
+# maximum number of messages in a burst. By default, the register is written
+# after each message. Raising it saves register writes but is unsafe: if the
+# process dies in the middle of a burst, the transitions of all the messages
+# already handled in that burst are lost, and other workers wait on the
+# register's lock for the whole burst.
+MAX_QUEUED_BURST = 1
+
 # Max internal jumps allowed. This is to avoid infinite loops in poorly
 # configured transitions.
 MAX_INTERNAL_JUMPS = 10
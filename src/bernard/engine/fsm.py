@@ -1,7 +1,9 @@
 import asyncio
 import importlib
 import logging
-from typing import Dict, Iterator, List, Optional, Text, Tuple, Type
+from collections import deque
+from types import MappingProxyType
+from typing import Deque, Dict, Iterator, List, Optional, Text, Tuple, Type
 
 import sentry_sdk
 
@@ -16,11 +18,13 @@ from bernard.utils import import_class
 from .request import BaseMessage, Request
 from .responder import Responder
 from .state import BaseState
-from .transition import Transition
+from .transition import Transition, rank_trigger
 from .triggers import BaseTrigger
 
 logger = logging.getLogger("bernard.fsm")
 
+Candidates = List[Tuple[int, Transition]]
+
 
 class FsmError(Exception):
     """
@@ -51,7 +55,11 @@ class FSM(object):
     def __init__(self):
         self.register = self._make_register()
         self.transitions = self._make_transitions()
-        self._allowed_states = set(self._make_allowed_states())
+        self._candidates = self._make_candidates()
+        self._jumping_bounds = self._make_jumping_bounds()
+        self._allowed_states = MappingProxyType(dict(self._make_allowed_states()))
+        self._queues = {}  # type: Dict[Text, Deque[Tuple[BaseMessage, Responder]]]
+        self._default_state = None  # type: Optional[Type[BaseState]]
 
     async def health_check(self) -> Iterator[HealthCheckFail]:
         """
@@ -120,17 +128,72 @@ class FSM(object):
         module_ = importlib.import_module(module_name)
         return module_.transitions
 
-    def _make_allowed_states(self) -> Iterator[Text]:
+    def _make_candidates(self) -> Dict[Tuple[bool, Optional[Text]], Candidates]:
+        """
+        Index the transitions that can trigger for each (internal, origin)
+        couple. Each transition is stored along with its position in the
+        transitions list, which is used to break ties.
+
+        The `None` origin holds the transitions without origin. Those can
+        trigger from any state (with a penalty), they are listed separately
+        by `_split_candidates()`.
+
+        Transitions are sorted by decreasing weight, so the ones that can
+        score the most are started first when ranking.
+        """
+
+        out = {}
+
+        for pos, t in enumerate(self.transitions):
+            out.setdefault((t.internal, t.origin_name), []).append((pos, t))
+
+        for candidates in out.values():
+            candidates.sort(key=lambda c: (-c[1].weight, c[0]))
+
+        return out
+
+    def _make_jumping_bounds(self) -> Dict[bool, float]:
+        """
+        Best score that the jumping transitions can reach when they are
+        ranked against an origin, for internal and regular transitions.
+        """
+
+        penalty = settings.JUMPING_TRIGGER_PENALTY
+
+        return {
+            internal: max(t.weight for _, t in candidates) * penalty
+            for (internal, origin), candidates in self._candidates.items()
+            if origin is None
+        }
+
+    def _split_candidates(
+        self, origin: Optional[Text], internal: bool
+    ) -> Tuple[Candidates, Candidates]:
+        """
+        Returns the transitions that can trigger from `origin`, split between
+        the ones starting from this origin and the jumping ones.
+        """
+
+        jumping = self._candidates.get((internal, None), [])
+
+        if origin is None:
+            return jumping, []
+
+        return self._candidates.get((internal, origin), []), jumping
+
+    def _make_allowed_states(self) -> Iterator[Tuple[Text, Type[BaseState]]]:
         """
         Sometimes we load states from the database. In order to avoid loading
-        an arbitrary class, we list here the state classes that are allowed.
+        an arbitrary class, we list here the state classes that are allowed,
+        indexed by name. Since the transitions already hold the classes, there
+        is no need to import them again afterwards.
         """
 
         for trans in self.transitions:
-            yield trans.dest.name()
+            yield trans.dest.name(), trans.dest
 
             if trans.origin:
-                yield trans.origin.name()
+                yield trans.origin.name(), trans.origin
 
     async def _find_trigger(
         self, request: Request, origin: Optional[Text] = None, internal: bool = False
@@ -145,22 +208,110 @@ class FSM(object):
             origin = reg.get(Register.STATE)
             logger.debug("From state: %s", origin)
 
-        results = await asyncio.gather(
-            *(
-                x.rank(request, origin)
-                for x in self.transitions
-                if x.internal == internal
-            )
-        )
+        same, jumping = self._split_candidates(origin, internal)
+        best_key, best = await self._rank_candidates(request, same, 1.0)
 
-        if len(results):
-            score, trigger, state, dnr = max(results, key=lambda x: x[0])
+        if jumping:
+            # Jumping transitions can't score more than their weight with the
+            # penalty, so they are only ranked if one of them can still win.
+            bound = self._jumping_bounds[internal]
+
+            if bound >= settings.MINIMAL_TRIGGER_SCORE and (
+                best_key is None or best_key[0] <= bound
+            ):
+                key, result = await self._rank_candidates(
+                    request, jumping, settings.JUMPING_TRIGGER_PENALTY
+                )
+
+                if best_key is None or (key is not None and key > best_key):
+                    best_key, best = key, result
+
+        if best_key is not None:
+            score, trigger, state, dnr = best
 
             if score >= settings.MINIMAL_TRIGGER_SCORE:
                 return trigger, state, dnr
 
         return None, None, None
 
+    async def _rank_candidates(
+        self,
+        request: Request,
+        candidates: Candidates,
+        factor: float,
+    ) -> Tuple[Optional[Tuple[float, int]], Optional[Tuple]]:
+        """
+        Rank all the candidates and return the best result along with its
+        sorting key (score then earliest position).
+
+        Transitions sharing the same trigger factory only get their trigger
+        ranked once, unless the factory isn't pure.
+
+        The ranks are computed concurrently, up to `MAX_CONCURRENT_TRIGGERS`
+        at once. A transition can't score more than its weight times
+        `factor`, so as soon as the best result can't be beaten by a
+        transition still being ranked, that ranking is cancelled.
+        """
+
+        if not candidates:
+            return None, None
+
+        groups = {}
+
+        for pos, t in candidates:
+            key = t.factory if getattr(t.factory, "pure", True) else pos
+            groups.setdefault(key, []).append((pos, t))
+
+        limit = settings.MAX_CONCURRENT_TRIGGERS
+
+        if limit and len(groups) > limit:
+            sem = asyncio.Semaphore(limit)
+            tasks = {
+                asyncio.ensure_future(_throttled(sem, request, g[0][1].factory)): g
+                for g in groups.values()
+            }
+        else:
+            tasks = {
+                asyncio.ensure_future(_rank_factory(request, g[0][1].factory)): g
+                for g in groups.values()
+            }
+
+        # Candidates are sorted by decreasing weight, so the first transition
+        # of each group is the one that can score the most.
+        bounds = {
+            task: (g[0][1].weight * factor, -g[0][0]) for task, g in tasks.items()
+        }
+        pending = set(tasks)
+        best_key, best = None, None
+
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                for task in done:
+                    trigger, rank = task.result()
+
+                    for pos, t in tasks[task]:
+                        result = t.make_rank(factor, trigger, rank)
+                        key = result[0], -pos
+
+                        if best_key is None or key > best_key:
+                            best_key, best = key, result
+
+                beaten = set(task for task in pending if bounds[task] < best_key)
+
+                for task in beaten:
+                    task.cancel()
+
+                pending -= beaten
+        finally:
+            for task in pending:
+                task.cancel()
+
+        return best_key, best
+
     # noinspection PyTypeChecker
     def _confused_state(self, request: Request) -> Type[BaseState]:
         """
@@ -169,13 +320,15 @@ class FSM(object):
 
         origin = request.register.get(Register.STATE)
 
-        if origin in self._allowed_states:
-            try:
-                return import_class(origin)
-            except (AttributeError, ImportError):
-                pass
+        try:
+            return self._allowed_states[origin]
+        except KeyError:
+            pass
+
+        if self._default_state is None:
+            self._default_state = import_class(settings.DEFAULT_STATE)
 
-        return import_class(settings.DEFAULT_STATE)
+        return self._default_state
 
     async def _build_state(
         self, request: Request, message: BaseMessage, responder: Responder
@@ -258,64 +411,168 @@ class FSM(object):
         :return: The register that was saved
         """
 
+        reg_manager = self.register.work_on_register(message.get_conversation().id)
+
+        async with reg_manager as reg:
+            return await self._handle_in_register(message, responder, reg)
+
+    async def _handle_in_register(
+        self, message: BaseMessage, responder: Responder, reg: Register
+    ) -> Optional[Dict]:
+        """
+        Handles a message against a register that is already locked. The
+        register to save is put in the register's replacement.
+
+        :return: The replacement register, if any
+        """
+
         async def noop(request: Request, responder: Responder):
             pass
 
         mm = MiddlewareManager.instance()
-        reg_manager = self.register.work_on_register(message.get_conversation().id)
+        request = Request(message, reg)
+        await request.transform()
 
-        async with reg_manager as reg:
+        if not request.stack.layers:
+            return
+
+        logger.debug("Incoming message: %s", request.stack)
+        await mm.get("pre_handle", noop)(request, responder)
+
+        # noinspection PyBroadException
+        try:
+            state, trigger, dnr = await self._build_state(request, message, responder)
+        except Exception as e:
+            logger.exception(
+                "Error while finding a transition from %s", reg.get(Register.STATE)
+            )
+            sentry_sdk.capture_exception(e)
+            return
+
+        if state is None:
+            logger.debug(
+                'No next state found but "%s" is not confusing, stopping',
+                request.message,
+            )
+            return
+
+        state = await self._run_state(responder, state, trigger, request)
+
+        # noinspection PyBroadException
+        try:
+            await responder.flush(request)
+        except MissingTranslationError as e:
+            responder.clear()
+            responder.send([RawText(str(e))])
+            await responder.flush(request)
+
+            sentry_sdk.capture_exception(e)
+            logger.exception("Missing translation in state %s", state.name())
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+            logger.exception("Could not flush content after %s", state.name())
+        else:
+            if not dnr:
+                reg.replacement = await self._build_state_register(
+                    state,
+                    request,
+                    responder,
+                )
+            return reg.replacement
+
+    def _pop_message(
+        self, queue: Deque[Tuple[BaseMessage, Responder]]
+    ) -> Tuple[BaseMessage, Responder, List[Tuple[BaseMessage, Responder]]]:
+        """
+        Get the next message to handle from a conversation's queue.
+
+        If `MERGE_QUEUED_TEXTS` is enabled and the message is a single text,
+        all the single-text messages following it in the queue are merged
+        into it. The merged message is based on the last one of the burst,
+        the other messages of the burst are returned along with their
+        responders so that those can still be flushed.
+        """
+
+        message, responder = queue.popleft()
+        merged = []
+
+        if not settings.MERGE_QUEUED_TEXTS or not _is_single_text(message):
+            return message, responder, merged
+
+        texts = [message.get_stack().get_layer(RawText).text]
+
+        while queue and _is_single_text(queue[0][0]):
+            merged.append((message, responder))
+            message, responder = queue.popleft()
+            texts.append(message.get_stack().get_layer(RawText).text)
+
+        if merged:
+            message = message.with_layers([RawText("\n".join(texts))])
+
+        return message, responder, merged
+
+    async def _flush_merged(
+        self, merged: List[Tuple[BaseMessage, Responder]], reg: Register
+    ) -> None:
+        """
+        Flush the responders of messages that were merged into a later one.
+        They have nothing to say, but platforms might still have to
+        acknowledge their messages (like Telegram's callback queries).
+        """
+
+        for message, responder in merged:
             request = Request(message, reg)
             await request.transform()
+            await responder.flush(request)
 
-            if not request.stack.layers:
-                return
+    async def _handle_queue(self, conversation_id: Text):
+        """
+        Handle all the messages queued for a conversation, in order.
 
-            logger.debug("Incoming message: %s", request.stack)
-            await mm.get("pre_handle", noop)(request, responder)
+        The register is locked for bursts of up to MAX_QUEUED_BURST messages:
+        each message sees the register left by the previous one but the store
+        is only written once per burst. The cap makes sure a busy conversation
+        can't keep the register locked and unsaved indefinitely.
+        """
 
-            # noinspection PyBroadException
-            try:
-                state, trigger, dnr = await self._build_state(
-                    request, message, responder
-                )
-            except Exception as e:
-                logger.exception(
-                    "Error while finding a transition from %s", reg.get(Register.STATE)
-                )
-                sentry_sdk.capture_exception(e)
-                return
+        queue = self._queues[conversation_id]
+        burst = settings.MAX_QUEUED_BURST
 
-            if state is None:
-                logger.debug(
-                    'No next state found but "%s" is not confusing, stopping',
-                    request.message,
-                )
-                return
-
-            state = await self._run_state(responder, state, trigger, request)
-
-            # noinspection PyBroadException
-            try:
-                await responder.flush(request)
-            except MissingTranslationError as e:
-                responder.clear()
-                responder.send([RawText(str(e))])
-                await responder.flush(request)
-
-                sentry_sdk.capture_exception(e)
-                logger.exception("Missing translation in state %s", state.name())
-            except Exception as e:
-                sentry_sdk.capture_exception(e)
-                logger.exception("Could not flush content after %s", state.name())
-            else:
-                if not dnr:
-                    reg.replacement = await self._build_state_register(
-                        state,
-                        request,
-                        responder,
-                    )
-                return reg.replacement
+        try:
+            while queue:
+                reg_manager = self.register.work_on_register(conversation_id)
+
+                async with reg_manager as stored:
+                    reg = stored
+                    handled = 0
+
+                    while queue and handled < burst:
+                        message, responder, merged = self._pop_message(queue)
+                        handled += 1
+
+                        # Like an exception in a task of its own, the error
+                        # goes to the loop's exception handler. The following
+                        # messages are still handled.
+                        # noinspection PyBroadException
+                        try:
+                            await self._flush_merged(merged, reg)
+                            replacement = await self._handle_in_register(
+                                message, responder, reg
+                            )
+                        except Exception as e:
+                            asyncio.get_event_loop().call_exception_handler(
+                                {
+                                    "message": f"Could not handle message {message}",
+                                    "exception": e,
+                                }
+                            )
+                            continue
+
+                        if replacement is not None:
+                            stored.replacement = replacement
+                            reg = Register(replacement)
+        finally:
+            del self._queues[conversation_id]
 
     def handle_message(
         self, message: BaseMessage, responder: Responder, create_task: True
@@ -326,15 +583,51 @@ class FSM(object):
             - A message from the platform
             - A responder from the platform
 
-        If `create_task` is true, them the task will automatically be added to
-        the loop. However, if it is not, the coroutine will be returned and it
-        will be the responsibility of the caller to run/start the task.
+        If `create_task` is true, then the message is queued and will be
+        handled in a task, after the previously received messages of the same
+        conversation. However, if it is not, the coroutine will be returned and
+        it will be the responsibility of the caller to run/start the task.
         """
 
-        coro = self._handle_message(message, responder)
+        if not create_task:
+            return self._handle_message(message, responder)
 
-        if create_task:
-            loop = asyncio.get_event_loop()
-            loop.create_task(coro)
-        else:
-            return coro
+        conversation_id = message.get_conversation().id
+        queue = self._queues.get(conversation_id)
+
+        if queue is not None:
+            queue.append((message, responder))
+            return
+
+        self._queues[conversation_id] = deque([(message, responder)])
+        loop = asyncio.get_event_loop()
+        loop.create_task(self._handle_queue(conversation_id))
+
+
+async def _rank_factory(request: Request, factory) -> Tuple[BaseTrigger, float]:
+    """
+    Build the trigger of a factory for this request and rank it.
+    """
+
+    trigger = request.get_trigger(factory)
+    return trigger, await rank_trigger(trigger)
+
+
+async def _throttled(
+    sem: asyncio.Semaphore, request: Request, factory
+) -> Tuple[BaseTrigger, float]:
+    """
+    Rank a trigger factory once the semaphore lets it through.
+    """
+
+    async with sem:
+        return await _rank_factory(request, factory)
+
+
+def _is_single_text(message: BaseMessage) -> bool:
+    """
+    Checks that the message is only made of a raw text
+    """
+
+    layers = message.get_stack().layers
+    return len(layers) == 1 and isinstance(layers[0], RawText)
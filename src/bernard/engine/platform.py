@@ -82,10 +82,12 @@ class Platform(object):
         """
         Notify all callbacks that a message was received.
         """
+        fsm_creates_task = self.fsm_creates_task
+
         for cb in self._listeners:
-            coro = cb(message, responder, self.fsm_creates_task)
+            coro = cb(message, responder, fsm_creates_task)
 
-            if not self.fsm_creates_task:
+            if not fsm_creates_task:
                 self._register = await coro
 
     def accept(self, stack: Stack):
@@ -101,6 +103,23 @@ class Platform(object):
         """
         raise NotImplementedError
 
+    def accept_batch(self) -> bool:
+        """
+        Return True if the platform can send several stacks at once with
+        `send_batch()`, typically in a single API call.
+        """
+
+        return False
+
+    async def send_batch(self, request: Request, stacks: List[Stack]) -> None:
+        """
+        Send several stacks to the user, in order. Platforms that can do it
+        in one go should overload this method and `accept_batch()`.
+        """
+
+        for stack in stacks:
+            await self.send(request, stack)
+
     async def ensure_usable_media(self, media: BaseMedia) -> BaseMedia:
         """
         Ensure that the media passed as argument can be used to send on the
@@ -116,7 +135,7 @@ class Platform(object):
         Run the self health-check. This one is a dummy one.
         """
 
-        for i in []:
+        if False:  # pragma: no cover
             yield
 
     def hook_up(self, router: UrlDispatcher):
@@ -147,6 +166,19 @@ class Platform(object):
 
 class SimplePlatform(Platform):
     PATTERNS = {}
+    _SEND_TABLE = {}
+
+    def __init_subclass__(cls, **kwargs):
+        """
+        Build the name of the `_send_*` method of each pattern once when the
+        class is created, so `send()` does not have to for every stack. The
+        method itself is still looked up on the instance, so overrides keep
+        working.
+        """
+
+        super().__init_subclass__(**kwargs)
+
+        cls._SEND_TABLE = {name: "_send_" + name for name in cls.PATTERNS}
 
     def __init__(self):
         super(SimplePlatform, self).__init__()
@@ -158,7 +190,7 @@ class SimplePlatform(Platform):
         outgoing connexions to the platform alive.
         """
         self.session = httpx.AsyncClient()
-        _ = asyncio.get_event_loop().create_task(self._deferred_init())
+        _ = asyncio.get_running_loop().create_task(self._deferred_init())
 
     async def _deferred_init(self):
         """
@@ -193,8 +225,12 @@ class SimplePlatform(Platform):
             if not self.accept(stack):
                 raise UnacceptableStack("Cannot accept stack {}".format(stack))
 
-        func = getattr(self, "_send_" + stack.annotation)
-        return await func(request, stack)
+        try:
+            name = self._SEND_TABLE[stack.annotation]
+        except KeyError:
+            name = "_send_" + stack.annotation
+
+        return await getattr(self, name)(request, stack)
 
     def ensure_usable_media(self, media: BaseMedia) -> BaseMedia:
         raise NotImplementedError
@@ -1,6 +1,7 @@
+from copy import copy
 from datetime import tzinfo
 from enum import Enum
-from typing import TYPE_CHECKING, Any, List, Optional, Text, Type
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Text, Type
 from urllib.parse import quote, urlparse, urlunparse
 
 from bernard.conf import settings
@@ -10,6 +11,7 @@ from bernard.storage.register import Register
 from bernard.utils import patch_qs
 
 if TYPE_CHECKING:
+    from bernard.engine.triggers import BaseTrigger
     from bernard.i18n.translator import Flags
 
 
@@ -89,8 +91,7 @@ class BaseMessage(object):
     """
 
     def __repr__(self):
-        stack = Stack(self.get_layers())
-        return f"{self.__class__.__name__}({stack})"
+        return f"{self.__class__.__name__}({self.get_stack()})"
 
     def get_platform(self) -> Text:
         """
@@ -117,6 +118,35 @@ class BaseMessage(object):
         """
         raise NotImplementedError
 
+    def get_stack(self) -> Stack:
+        """
+        Return a stack of the layers found in the message. It is only built
+        once per message, the same stack is returned on subsequent calls.
+        """
+
+        try:
+            return self._stack
+        except AttributeError:
+            self._stack = Stack(self.get_layers())
+            return self._stack
+
+    def with_layers(self, layers: List[BaseLayer]) -> "BaseMessage":
+        """
+        Return a copy of this message whose layers are the specified ones
+        instead of its own. Everything else still comes from this message.
+        """
+
+        layers = list(layers)
+        message = copy(self)
+
+        # get_layers() is implemented by each platform, so it's overridden on
+        # the copy itself. The stack is then built from it like for any other
+        # message.
+        message.get_layers = lambda: list(layers)
+        vars(message).pop("_stack", None)
+
+        return message
+
     def should_confuse(self) -> bool:
         """
         If this returns "True" then the message should trigger a confused state
@@ -141,6 +171,21 @@ class Request(object):
     by the transitions and the handlers.
     """
 
+    # Slots make the request lighter and faster to use, while `__dict__`
+    # lets middlewares and bots keep storing their own attributes on it
+    __slots__ = (
+        "__dict__",
+        "message",
+        "platform",
+        "conversation",
+        "user",
+        "_stack",
+        "register",
+        "custom_content",
+        "_locale_override",
+        "_triggers",
+    )
+
     QUERY = "query"
     HASH = "hash"
 
@@ -149,11 +194,32 @@ class Request(object):
         self.platform = message.get_platform()
         self.conversation = message.get_conversation()
         self.user = message.get_user()
-        self.stack = Stack(message.get_layers())
+        self._stack = None
         self.register = register
         self.custom_content = {}
 
         self._locale_override = None
+        self._triggers = {}
+
+    @property
+    def stack(self) -> Stack:
+        """
+        Stack of the message's layers. It is only built when something needs
+        to look at the layers.
+        """
+
+        if self._stack is None:
+            self._stack = self.message.get_stack()
+
+        return self._stack
+
+    @stack.setter
+    def stack(self, stack: Stack) -> None:
+        """
+        Replace the stack of this request
+        """
+
+        self._stack = stack
 
     async def transform(self):
         await self.stack.transform(self)
@@ -167,8 +233,31 @@ class Request(object):
         :param default: What to return by default
         """
 
-        tr = self.register.get(Register.TRANSITION, {})
-        return tr.get(name, default)
+        try:
+            return self.register[Register.TRANSITION].get(name, default)
+        except KeyError:
+            return default
+
+    def get_trigger(
+        self, factory: Callable[["Request"], "BaseTrigger"]
+    ) -> "BaseTrigger":
+        """
+        Get the trigger built by `factory` for this request. Triggers are only
+        built once per request, so ranking the same transitions again (like
+        internal transitions after each jump) reuses them.
+
+        Factories that must build a new trigger each time can be marked with
+        a `pure` attribute set to False.
+        """
+
+        if not getattr(factory, "pure", True):
+            return factory(self)
+
+        try:
+            return self._triggers[factory]
+        except KeyError:
+            trigger = self._triggers[factory] = factory(self)
+            return trigger
 
     def has_layer(self, class_: Type[L], became: bool = True) -> bool:
         """
@@ -182,6 +271,12 @@ class Request(object):
         """
         return self.stack.get_layer(class_, became)
 
+    def find_layer(self, class_: Type[L], became: bool = True) -> Optional[L]:
+        """
+        Proxy to stack
+        """
+        return self.stack.find_layer(class_, became)
+
     def get_layers(self, class_: Type[L], became: bool = True) -> List[L]:
         """
         Proxy to stack
@@ -198,6 +293,15 @@ class Request(object):
 
         self._locale_override = locale
 
+    @property
+    def locale_override(self) -> Optional[Text]:
+        """
+        Synchronous access to the overridden locale (if any), for callers that
+        don't need to fall back on the platform's locale.
+        """
+
+        return self._locale_override
+
     async def get_locale(self) -> Text:
         """
         Get the locale to use for this request. It's either the overridden
@@ -206,10 +310,12 @@ class Request(object):
         :return: Locale to use for this request
         """
 
-        if self._locale_override:
-            return self._locale_override
-        else:
-            return await self.user.get_locale()
+        override = self._locale_override
+
+        if override:
+            return override
+
+        return await self.user.get_locale()
 
     async def get_trans_flags(self) -> "Flags":
         """
@@ -238,17 +344,39 @@ class Request(object):
 
         token = await self.get_token()
 
-        if method == self.QUERY:
-            return patch_qs(
-                url,
-                {
-                    settings.WEBVIEW_TOKEN_KEY: token,
-                },
-            )
-        elif method == self.HASH:
-            hash_id = 5
-            p = list(urlparse(url))
-            p[hash_id] = quote(token)
-            return urlunparse(p)
-        else:
+        try:
+            sign = _SIGN_METHODS[method]
+        except KeyError:
             raise ValueError(f'Invalid signing method "{method}"')
+
+        return sign(url, token)
+
+
+def _sign_query(url: Text, token: Text) -> Text:
+    """
+    Sign the URL by putting the token in its query string
+    """
+
+    return patch_qs(
+        url,
+        {
+            settings.WEBVIEW_TOKEN_KEY: token,
+        },
+    )
+
+
+def _sign_hash(url: Text, token: Text) -> Text:
+    """
+    Sign the URL by putting the token in its hash
+    """
+
+    hash_id = 5
+    p = list(urlparse(url))
+    p[hash_id] = quote(token)
+    return urlunparse(p)
+
+
+_SIGN_METHODS: Dict[Text, Callable[[Text, Text], Text]] = {
+    Request.QUERY: _sign_query,
+    Request.HASH: _sign_hash,
+}
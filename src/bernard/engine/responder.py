@@ -1,3 +1,4 @@
+import asyncio
 from typing import TYPE_CHECKING, List, Union
 
 from bernard.layers import BaseLayer, Stack
@@ -31,6 +32,9 @@ class Responder(object):
     won't need to change anything.
     """
 
+    # `__dict__` keeps arbitrary attributes working, as before slots
+    __slots__ = ("__dict__", "platform", "_stacks")
+
     def __init__(self, platform: "Platform"):
         self.platform = platform
         self._stacks = []  # type: List[Stack]
@@ -63,11 +67,13 @@ class Responder(object):
 
         The first step is to convert all media in the stacked layers then the
         second step is to send all messages as grouped in time as possible.
+
+        Media of the different stacks are converted concurrently, while
+        messages are sent one after the other to keep them in order.
         """
         from bernard.middleware import MiddlewareManager
 
-        for stack in self._stacks:
-            await stack.convert_media(self.platform)
+        await asyncio.gather(*(s.convert_media(self.platform) for s in self._stacks))
 
         func = MiddlewareManager.instance().get("flush", self._flush)
         await func(request, self._stacks)
@@ -76,10 +82,16 @@ class Responder(object):
         """
         Perform the actual sending to platform. This is separated from
         `flush()` since it needs to be inside a middleware call.
+
+        If the platform can send all the stacks at once, they are sent as a
+        single batch.
         """
 
-        for stack in stacks:
-            await self.platform.send(request, stack)
+        if self.platform.accept_batch():
+            await self.platform.send_batch(request, stacks)
+        else:
+            for stack in stacks:
+                await self.platform.send(request, stack)
 
     async def make_transition_register(self, request: "Request"):
         """
@@ -1,3 +1,4 @@
+import sys
 from typing import Iterator
 
 from bernard.core.health_check import HealthCheckFail
@@ -19,6 +20,19 @@ class BaseState(object):
     `DEFAULT_STATE` in the configuration.
     """
 
+    __slots__ = ("request", "responder", "trigger", "user_trigger")
+
+    _qualified_name = sys.intern(f"{__module__}.{__qualname__}")
+
+    def __init_subclass__(cls, **kwargs):
+        """
+        Compute the name of each state class once and for all. Names are
+        interned since they are used as keys of the FSM's indexes.
+        """
+
+        super().__init_subclass__(**kwargs)
+        cls._qualified_name = sys.intern(f"{cls.__module__}.{cls.__qualname__}")
+
     def __init__(
         self,
         request: Request,
@@ -38,10 +52,7 @@ class BaseState(object):
         name.
         """
 
-        return "{}.{}".format(
-            cls.__module__,
-            cls.__qualname__,
-        )
+        return cls._qualified_name
 
     @classmethod
     async def health_check(cls) -> Iterator[HealthCheckFail]:
@@ -1,10 +1,12 @@
 from typing import Optional, Text, Tuple, Type
 
 from bernard.conf import settings
-from bernard.utils import run_or_return
 
 from .state import BaseState
-from .triggers import BaseTrigger
+from .triggers import BaseTrigger, rank_trigger
+
+# Rank of a transition that cannot start from the current state
+_ZERO_RANK = (0.0, None, None, None)
 
 
 class Transition(object):
@@ -13,6 +15,17 @@ class Transition(object):
     trigger in charge.
     """
 
+    __slots__ = (
+        "origin",
+        "dest",
+        "factory",
+        "weight",
+        "desc",
+        "internal",
+        "do_not_register",
+        "origin_name",
+    )
+
     def __init__(
         self,
         dest: Type[BaseState],
@@ -75,10 +88,17 @@ class Transition(object):
         elif self.origin_name is None:
             score = settings.JUMPING_TRIGGER_PENALTY
         else:
-            return 0.0, None, None, None
+            return _ZERO_RANK
+
+        trigger = request.get_trigger(self.factory)
+        return self.make_rank(score, trigger, await rank_trigger(trigger))
 
-        trigger = self.factory(request)
-        rank = await run_or_return(trigger.rank())
-        score *= self.weight * (rank or 0.0)
+    def make_rank(
+        self, factor: float, trigger: BaseTrigger, rank: float
+    ) -> Tuple[float, Optional[BaseTrigger], Optional[type], Optional[bool]]:
+        """
+        Builds the rank of this transition (see `rank()`) from the rank of
+        its trigger and the factor due to the origin.
+        """
 
-        return score, trigger, self.dest, self.do_not_register
+        return factor * self.weight * rank, trigger, self.dest, self.do_not_register
@@ -1,4 +1,6 @@
 import asyncio
+import sys
+from functools import lru_cache
 from typing import Any, Callable, List, Optional
 from typing import Text as TextT
 from typing import Type
@@ -7,11 +9,49 @@ from bernard import layers as l
 from bernard.engine.request import Request
 from bernard.i18n import intents, render
 from bernard.i18n.intents import Intent
-from bernard.trigram import Matcher, Trigram
+from bernard.trigram import Trigram
 from bernard.utils import run_or_return
 
 
+@lru_cache(maxsize=1024)
+def _text_trigram(text: TextT) -> Trigram:
+    """
+    Trigram of a text received from the user. All the text triggers of a
+    request rank the same text, and concurrent requests often carry the same
+    short texts, so each distinct text is only normalized and split once.
+    Texts of the choices offered to the user are cached the same way.
+    """
+
+    return Trigram(text)
+
+
+def _trigger_cost(factory: Callable[[Request], "BaseTrigger"]) -> int:
+    """
+    Cost of the triggers built by a factory
+    """
+
+    return getattr(factory, "cost", BaseTrigger.cost)
+
+
 class BaseTrigger(object):
+    __slots__ = ("request",)
+
+    # Triggers are built once per request and then reused each time their
+    # transition is ranked again, so rank() must reset whatever it found the
+    # previous time (see `Choice`). Set this to False to build a new trigger
+    # each time instead.
+    pure = True
+
+    # Set this to True if rank() is a regular function doing heavy work
+    # (regular expressions, local models, ...) so it runs in a thread instead
+    # of blocking the event loop.
+    cpu_bound = False
+
+    # Rough cost of rank(), used to rank cheap triggers first when they are
+    # combined (see `Worst`). Simple layer checks are around 1, text matching
+    # around 10 and remote calls around 100.
+    cost = 10
+
     def __init__(self, request: Request):
         self.request = request
 
@@ -21,6 +61,8 @@ class BaseTrigger(object):
             return cls(request, *args, **kwargs)
 
         factory.trigger_name = cls.__name__
+        factory.pure = cls.pure
+        factory.cost = cls.cost
         return factory
 
     def rank(self) -> Optional[float]:
@@ -47,6 +89,10 @@ class SharedTrigger(BaseTrigger):
     share the same call to the remote API.
     """
 
+    __slots__ = ()
+
+    cost = 100
+
     @classmethod
     def name(cls) -> str:
         """
@@ -55,13 +101,23 @@ class SharedTrigger(BaseTrigger):
 
         return f"{cls.__module__}.{cls.__qualname__}"
 
+    @classmethod
+    def cache_key(cls) -> str:
+        """
+        Triggers with the same cache key share their API call. By default,
+        it's the name of the class, but different classes calling the same
+        API can override it to return the same key.
+        """
+
+        return cls.name()
+
     @property
     def content_key(self) -> str:
         """
         That's the key used to store the content in the request
         """
 
-        return f"{self.name()}::content"
+        return f"{self.cache_key()}::content"
 
     @property
     def lock_key(self) -> str:
@@ -69,7 +125,7 @@ class SharedTrigger(BaseTrigger):
         That's the key to store the lock of this trigger
         """
 
-        return f"{self.name()}::lock"
+        return f"{self.cache_key()}::lock"
 
     @property
     def lock(self) -> asyncio.Lock:
@@ -77,10 +133,13 @@ class SharedTrigger(BaseTrigger):
         Return and generate if required the lock for this request.
         """
 
-        if self.lock_key not in self.request.custom_content:
-            self.request.custom_content[self.lock_key] = asyncio.Lock()
+        cc = self.request.custom_content
+        key = self.lock_key
 
-        return self.request.custom_content[self.lock_key]
+        try:
+            return cc[key]
+        except KeyError:
+            return cc.setdefault(key, asyncio.Lock())
 
     async def call_api(self) -> Any:
         """
@@ -125,6 +184,10 @@ class Anything(BaseTrigger):
     A trigger that will always match
     """
 
+    __slots__ = ()
+
+    cost = 0
+
     def rank(self):
         """
         Always return 1
@@ -137,6 +200,8 @@ class Text(BaseTrigger):
     A trigger that will match an intent in a text message
     """
 
+    __slots__ = ("intent",)
+
     def __init__(self, request: Request, intent: Intent):
         super(Text, self).__init__(request)
         self.intent = intent
@@ -147,18 +212,14 @@ class Text(BaseTrigger):
         text in the specified intent.
         """
 
-        if not self.request.has_layer(l.RawText):
+        tl = self.request.find_layer(l.RawText)
+
+        if tl is None:
             return
 
-        tl = self.request.get_layer(l.RawText)
-        matcher = Matcher(
-            [
-                tuple(Trigram(y) for y in x)
-                for x in await self.intent.strings(self.request)
-            ]
-        )
+        matcher = await self.intent.matcher(self.request)
 
-        return matcher % Trigram(tl.text)
+        return matcher % _text_trigram(tl.text)
 
 
 class Choice(BaseTrigger):
@@ -173,6 +234,8 @@ class Choice(BaseTrigger):
     The optional `when` argument allows to limit matching to a single choice.
     """
 
+    __slots__ = ("when", "slug", "chosen")
+
     def __init__(self, request: Request, when: Optional[TextT] = None):
         super(Choice, self).__init__(request)
         self.when = when
@@ -180,14 +243,12 @@ class Choice(BaseTrigger):
         self.chosen = None
 
     # noinspection PyUnresolvedReferences
-    def _rank_qr(self, choices):
+    def _rank_qr(self, choices, qr):
         """
         Look for the QuickReply layer's slug into available choices.
         """
-        from bernard.platforms.facebook import layers as fbl
 
         try:
-            qr = self.request.get_layer(fbl.QuickReply)
             self.chosen = choices[qr.slug]
             self.slug = qr.slug
 
@@ -196,32 +257,34 @@ class Choice(BaseTrigger):
         except KeyError:
             pass
 
-    async def _rank_text(self, choices):
+    async def _rank_text(self, choices, tl):
         """
         Try to match the TextLayer with choice's intents.
         """
 
-        tl = self.request.get_layer(l.RawText)
+        text = _text_trigram(await render(tl.text, self.request))
+        locale = await self.request.get_locale()
+        db = intents.db
         best = 0.0
 
         for slug, params in choices.items():
-            strings = []
+            score = 0.0
 
             if params["intent"]:
-                intent = getattr(intents, params["intent"])
-                strings += await intent.strings(self.request)
+                score = db.get_matcher(params["intent"], locale) % text
 
             if params["text"]:
-                strings.append((params["text"],))
-
-            matcher = Matcher([tuple(Trigram(y) for y in x) for x in strings])
-            score = matcher % Trigram(await render(tl.text, self.request))
+                score = max(score, _text_trigram(params["text"]) % text)
 
             if score > best:
                 self.chosen = params
                 self.slug = slug
                 best = score
 
+                # The first exact match wins anyway
+                if best >= 1.0:
+                    break
+
         if self.when is None or self.slug == self.when:
             return best
 
@@ -235,15 +298,24 @@ class Choice(BaseTrigger):
         """
         from bernard.platforms.facebook import layers as fbl
 
+        # The trigger might have been ranked before with other choices
+        self.slug = None
+        self.chosen = None
+
         choices = self.request.get_trans_reg("choices")
 
         if not choices:
             return
 
-        if self.request.has_layer(fbl.QuickReply):
-            return self._rank_qr(choices)
-        elif self.request.has_layer(l.RawText):
-            return await self._rank_text(choices)
+        qr = self.request.find_layer(fbl.QuickReply)
+
+        if qr is not None:
+            return self._rank_qr(choices, qr)
+
+        tl = self.request.find_layer(l.RawText)
+
+        if tl is not None:
+            return await self._rank_text(choices, tl)
 
 
 class Action(BaseTrigger):
@@ -252,15 +324,19 @@ class Action(BaseTrigger):
     field in its payload. This trigger simply matches actions on text.
     """
 
+    __slots__ = ("action",)
+
+    cost = 1
+
     def __init__(self, request: Request, action: TextT):
         super(Action, self).__init__(request)
-        self.action = action
+        self.action = sys.intern(action)
 
     # noinspection PyUnresolvedReferences
     def rank(self) -> Optional[float]:
-        if self.request.has_layer(l.Postback):
-            pb = self.request.get_layer(l.Postback)
+        pb = self.request.find_layer(l.Postback)
 
+        if pb is not None:
             try:
                 if pb.payload["action"] == self.action:
                     return 1.0
@@ -273,6 +349,10 @@ class Layer(BaseTrigger):
     Gets triggered when the message contains a specific layer
     """
 
+    __slots__ = ("layer_type",)
+
+    cost = 1
+
     def __init__(self, request: Request, layer_type: Type[l.BaseLayer]):
         super(Layer, self).__init__(request)
         self.layer_type = layer_type
@@ -291,41 +371,86 @@ class BaseSlugTrigger(BaseTrigger):
     otherwise.
     """
 
+    __slots__ = ("slug",)
+
+    cost = 1
+
     LAYER_TYPE = None
 
     def __init__(self, request: Request, slug: Optional[Text] = None):
         super(BaseSlugTrigger, self).__init__(request)
-        self.slug = slug
+        self.slug = sys.intern(slug) if slug is not None else None
 
     def rank(self) -> Optional[float]:
-        if self.request.has_layer(self.LAYER_TYPE):
-            if (
-                self.request.get_layer(self.LAYER_TYPE).slug == self.slug
-                or self.slug is None
-            ):
-                return 1.0
+        layer = self.request.find_layer(self.LAYER_TYPE)
+
+        if layer is not None and (self.slug is None or layer.slug == self.slug):
+            return 1.0
+
+
+async def rank_trigger(trigger: "BaseTrigger") -> float:
+    """
+    Rank a trigger, in the default executor if it is CPU-bound.
+    """
+
+    if trigger.cpu_bound:
+        loop = asyncio.get_running_loop()
+        rank = await loop.run_in_executor(None, trigger.rank)
+    else:
+        rank = await run_or_return(trigger.rank())
+
+    return rank or 0.0
 
 
 class Worst(BaseTrigger):
     """
-    Run several triggers and only keep the worst one. Queries are not made
-    in parallel, and execution stops when 0.0 is reached.
+    Run several triggers and only keep the worst one. By default, queries are
+    not made in parallel, and execution stops when 0.0 is reached.
 
     This allows to put simple conditions first before doing more expensive
     tests.
+
+    If `sort_by_cost` is true, triggers are sorted by cost (see
+    `BaseTrigger.cost`) so the cheapest ones are ranked first. Triggers of
+    the same cost keep their order.
+
+    If `max_concurrency` is more than 1 (or None for no limit), that many
+    triggers are ranked at the same time, still starting in order. As soon
+    as one of them returns 0.0, the others are cancelled.
     """
 
+    __slots__ = ("triggers", "max_concurrency")
+
     def __init__(
-        self, request: Request, triggers: List[Callable[[Request], "BaseTrigger"]]
+        self,
+        request: Request,
+        triggers: List[Callable[[Request], "BaseTrigger"]],
+        max_concurrency: Optional[int] = 1,
+        sort_by_cost: bool = False,
     ):
         super(Worst, self).__init__(request)
+
+        if sort_by_cost:
+            triggers = sorted(triggers, key=_trigger_cost)
+
         self.triggers = triggers
+        self.max_concurrency = max_concurrency
 
     async def rank(self):
+        if self.max_concurrency == 1:
+            return await self._rank_in_order()
+
+        return await self._rank_concurrently()
+
+    async def _rank_in_order(self):
+        """
+        Rank triggers one after the other
+        """
+
         m = 1.0
 
         for t in self.triggers:
-            r = await run_or_return(t(self.request).rank())
+            r = await rank_trigger(self.request.get_trigger(t))
 
             if not r:
                 return 0.0
@@ -334,6 +459,42 @@ class Worst(BaseTrigger):
 
         return m
 
+    async def _rank_concurrently(self):
+        """
+        Rank up to `max_concurrency` triggers at once
+        """
+
+        if self.max_concurrency:
+            sem = asyncio.Semaphore(self.max_concurrency)
+        else:
+            sem = None
+
+        async def rank(factory):
+            trigger = self.request.get_trigger(factory)
+
+            if sem is None:
+                return await rank_trigger(trigger)
+
+            async with sem:
+                return await rank_trigger(trigger)
+
+        tasks = [asyncio.ensure_future(rank(t)) for t in self.triggers]
+        m = 1.0
+
+        try:
+            for future in asyncio.as_completed(tasks):
+                r = await future
+
+                if not r:
+                    return 0.0
+                elif r < m:
+                    m = r
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        return m
+
 
 class Equal(BaseTrigger):
     """
@@ -341,6 +502,10 @@ class Equal(BaseTrigger):
     provided layer.
     """
 
+    __slots__ = ("layer",)
+
+    cost = 1
+
     def __init__(self, request: Request, layer: l.BaseLayer):
         super().__init__(request)
         self.layer = layer
@@ -1,5 +1,12 @@
 from .intents import IntentsMaker
-from .translator import Translator, TransText, render, serialize, unserialize
+from .translator import (
+    Translator,
+    TransText,
+    render,
+    render_many,
+    serialize,
+    unserialize,
+)
 
 translate = Translator()
 intents = IntentsMaker()
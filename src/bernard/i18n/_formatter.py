@@ -1,10 +1,29 @@
 import string
 from datetime import date, datetime, tzinfo
-from typing import Text, Union
+from functools import lru_cache
+from typing import Callable, Optional, Text, Tuple, Union
 
-from babel import dates, numbers
+from babel import Locale, dates, numbers
 from dateutil.parser import parse as parse_date
 
+PREDEFINED_FORMATS = {"full", "long", "medium", "short"}
+
+
+@lru_cache(maxsize=4096)
+def _parse_iso(obj: Text) -> datetime:
+    """
+    Parses an ISO 8601 date/time string. Most strings are understood by
+    `fromisoformat()`, which is way faster than dateutil's parser, and the
+    parser is only used for the others.
+    """
+
+    try:
+        if obj.endswith("Z"):
+            return datetime.fromisoformat(obj[:-1] + "+00:00")
+        return datetime.fromisoformat(obj)
+    except ValueError:
+        return parse_date(obj)
+
 
 def make_date(obj: Union[date, datetime, Text], timezone: tzinfo = None):
     """
@@ -17,14 +36,15 @@ def make_date(obj: Union[date, datetime, Text], timezone: tzinfo = None):
     date object will be in the specified time zone.
     """
 
+    if isinstance(obj, str):
+        obj = _parse_iso(obj)
+
     if isinstance(obj, datetime):
-        if hasattr(obj, "astimezone") and timezone:
+        if timezone:
             obj = obj.astimezone(timezone)
         return obj.date()
     elif isinstance(obj, date):
         return obj
-    elif isinstance(obj, str):
-        return make_date(parse_date(obj), timezone)
 
 
 def make_datetime(obj: Union[datetime, Text], timezone: tzinfo = None):
@@ -39,11 +59,53 @@ def make_datetime(obj: Union[datetime, Text], timezone: tzinfo = None):
     """
 
     if isinstance(obj, datetime):
-        if hasattr(obj, "astimezone") and timezone:
+        if timezone:
             obj = obj.astimezone(timezone)
         return obj
     elif isinstance(obj, str):
-        return make_date(parse_date(obj), timezone)
+        return make_date(_parse_iso(obj), timezone)
+
+
+@lru_cache(maxsize=1024)
+def _parse_spec(spec: Text) -> Tuple[Optional[Text], Optional[Text]]:
+    """
+    Splits a format spec into the kind of formatter to use and its format.
+    The kind is None for specs that aren't handled by `I18nFormatter`.
+    """
+
+    if spec.startswith("date:"):
+        return "date", spec[5:]
+    elif spec.startswith("datetime:"):
+        return "datetime", spec[9:]
+    elif spec == "number":
+        return "number", None
+    else:
+        return None, None
+
+
+@lru_cache(maxsize=128)
+def _locale(lang: Text) -> Locale:
+    """
+    Parsed locale of a language
+    """
+
+    return Locale.parse(lang or dates.LC_TIME)
+
+
+@lru_cache(maxsize=1024)
+def _date_formatter(format_: Text, lang: Text) -> Callable[[date], Text]:
+    """
+    Compiles a Babel date format for a language. The locale and the pattern
+    are resolved once instead of at each call of `format_date()`.
+    """
+
+    locale = _locale(lang)
+
+    if format_ in PREDEFINED_FORMATS:
+        format_ = dates.get_date_format(format_, locale=locale)
+
+    pattern = dates.parse_pattern(format_)
+    return lambda value: pattern.apply(value, locale)
 
 
 class I18nFormatter(string.Formatter):
@@ -69,33 +131,37 @@ class I18nFormatter(string.Formatter):
         Format the date using Babel
         """
         date_ = make_date(value)
-        return dates.format_date(date_, format_, locale=self.lang)
+        return _date_formatter(format_, self.lang)(date_)
 
     def format_datetime(self, value, format_):
         """
         Format the datetime using Babel
         """
         date_ = make_datetime(value)
-        return dates.format_datetime(date_, format_, locale=self.lang)
+        return dates.format_datetime(date_, format_, locale=_locale(self.lang))
 
     def format_number(self, value):
         """
         Format the number using Babel
         """
-        return numbers.format_number(value, locale=self.lang)
+        return numbers.format_decimal(value, locale=_locale(self.lang))
 
     def format_field(self, value, spec):
         """
         Provide the additional formatters for localization.
         """
 
-        if spec.startswith("date:"):
-            _, format_ = spec.split(":", 1)
+        # Plain fields are by far the most common
+        if not spec:
+            return format(value)
+
+        kind, format_ = _parse_spec(spec)
+
+        if kind == "date":
             return self.format_date(value, format_)
-        elif spec.startswith("datetime:"):
-            _, format_ = spec.split(":", 1)
+        elif kind == "datetime":
             return self.format_datetime(value, format_)
-        elif spec == "number":
+        elif kind == "number":
             return self.format_number(value)
         else:
             return super(I18nFormatter, self).format_field(value, spec)
@@ -1,7 +1,8 @@
 # config: utf-8
-from typing import TYPE_CHECKING, List, Optional, Text, Tuple
+from typing import TYPE_CHECKING, Dict, List, Optional, Text, Tuple
 
 from bernard.conf import settings
+from bernard.trigram import Matcher, Trigram
 from bernard.utils import import_class, run
 
 from .loaders import BaseIntentsLoader, IntentDict
@@ -20,6 +21,8 @@ class IntentsDb(LocalesFlatDict):
     def __init__(self):
         super(IntentsDb, self).__init__()
         self.loaders = []  # type: List[BaseIntentsLoader]
+        # Matchers along with the strings they were built from
+        self._matchers = {}  # type: Dict[Tuple[Text, Text], Tuple[List, Matcher]]
         self._init_loaders()
 
     def _init_loaders(self) -> None:
@@ -35,15 +38,19 @@ class IntentsDb(LocalesFlatDict):
 
     def update(self, new_data: IntentDict):
         """
-        Receive an update from the loaders.
+        Receive an update from the loaders. The trigram matchers of the
+        updated intents are built right away, so messages don't have to.
         """
 
         for locale, data in new_data.items():
             if locale not in self.dict:
-                self.dict[locale] = {}
+                self.add_locale(locale)
 
             self.dict[locale].update(data)
 
+            for key, strings in data.items():
+                self._cache_matcher(key, locale, strings)
+
     def get(self, key: Text, locale: Optional[Text]) -> List[Tuple[Text, ...]]:
         """
         Get a single set of intents.
@@ -53,6 +60,48 @@ class IntentsDb(LocalesFlatDict):
 
         return self.dict[locale][key]
 
+    def get_matcher(self, key: Text, locale: Optional[Text]) -> Matcher:
+        """
+        Get the trigram matcher of a set of intents. Like `get()`, it raises
+        a KeyError if the intent does not exist.
+
+        Matchers are built on first use and built again if the strings of the
+        intent changed since then (by example if `dict` was edited directly).
+        """
+
+        locale = self.choose_locale(locale)
+        strings = self.dict[locale][key]
+
+        try:
+            known, matcher = self._matchers[(key, locale)]
+        except KeyError:
+            pass
+        else:
+            if known == strings:
+                return matcher
+
+        return self._cache_matcher(key, locale, strings)
+
+    def _cache_matcher(
+        self, key: Text, locale: Optional[Text], strings: List[Tuple[Text, ...]]
+    ) -> Matcher:
+        """
+        Build the matcher of an intent and remember it along with a copy of
+        its strings.
+        """
+
+        matcher = self._make_matcher(strings)
+        self._matchers[(key, locale)] = (list(strings), matcher)
+        return matcher
+
+    @staticmethod
+    def _make_matcher(strings: List[Tuple[Text, ...]]) -> Matcher:
+        """
+        Turns the strings of an intent into a trigram matcher
+        """
+
+        return Matcher([tuple(Trigram(y) for y in x) for x in strings])
+
 
 class Intent(object):
     """
@@ -85,6 +134,19 @@ class Intent(object):
 
         return self.db.get(self.key, locale)
 
+    async def matcher(self, request: Optional["Request"] = None) -> Matcher:
+        """
+        Same as `strings()` but returns a trigram matcher of those strings,
+        ready to be compared to the user's text.
+        """
+
+        if request:
+            locale = await request.get_locale()
+        else:
+            locale = None
+
+        return self.db.get_matcher(self.key, locale)
+
 
 class IntentsMaker(object):
     """
@@ -93,6 +155,7 @@ class IntentsMaker(object):
     """
 
     def __init__(self, db: IntentsDb = None):
+        self._intents = {}  # type: Dict[Text, Intent]
         self.db = db
 
         if not self.db:
@@ -104,6 +167,7 @@ class IntentsMaker(object):
         """
 
         self.db = IntentsDb()
+        self._intents.clear()
 
     def __getattr__(self, key: Text) -> Intent:
         """
@@ -111,6 +175,16 @@ class IntentsMaker(object):
 
         >>> i = IntentsMaker()
         >>> print(await i.FOO.strings())
+
+        Intents are generated once per key, so looking up the same intent
+        for each message (like the `Choice` trigger does) is a dict lookup.
         """
 
-        return Intent(self.db, key)
+        if key == "_intents":
+            raise AttributeError(key)
+
+        try:
+            return self._intents[key]
+        except KeyError:
+            intent = self._intents[key] = Intent(self.db, key)
+            return intent
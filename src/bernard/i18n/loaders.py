@@ -1,8 +1,12 @@
 import asyncio
 import csv
+import hashlib
+import io
 import logging
 import os.path
-from typing import Callable, Dict, List, Optional, Text, Tuple, Union
+from collections import OrderedDict
+from itertools import count
+from typing import Any, Callable, Dict, Iterator, List, Optional, Text, Tuple, Union
 
 from bernard.conf import settings
 
@@ -11,19 +15,74 @@ if settings.I18N_LIVE_RELOAD:
 
 logger = logging.getLogger("bernard.i18n.loaders")
 
+_watch_ids = count()
+
+# Results of the latest parses, shared by all loaders. They are indexed by a
+# digest of the parsed content, so loading the same content again (from
+# another loader or when a file is restored) doesn't need to parse it again.
+_parsed = OrderedDict()  # type: OrderedDict[Tuple, Any]
+_PARSED_CACHE_SIZE = 16
+
 
 TransDict = Dict[Optional[Text], List[Tuple[Text, Text]]]
 IntentDict = Dict[Optional[Text], Dict[Text, List[Tuple[Text, ...]]]]
 
 
+# Line breaks known by str.splitlines() but not by CSV, which only knows
+# about \r and \n
+_EXTRA_LINE_BREAKS = "\v\f\x1c\x1d\x1e\x85\u2028\u2029"
+
+
+def _parse_csv(content: bytes) -> Iterator[List[Text]]:
+    """
+    Parses the rows of an Excel-formatted, UTF-8 encoded CSV file. Rows are
+    produced one by one, so they can be dropped as soon as they have been
+    processed instead of all being kept in memory until the end.
+
+    Most catalogs don't quote anything, in which case rows are simply split
+    on commas, which is much faster than going through the csv module one
+    character at a time. As soon as there is a quote or a line break that
+    CSV doesn't know about in the file, the csv module takes care of the
+    whole file.
+    """
+
+    data = content.decode("utf-8")
+
+    if '"' in data or any(c in data for c in _EXTRA_LINE_BREAKS):
+        return csv.reader(io.StringIO(data, newline=""))
+
+    return (line.split(",") for line in data.splitlines() if line)
+
+
 class LiveFileLoaderMixin(object):
     """
     A mixin to help detecting live changes in translations and update them
     directly when saved.
     """
 
+    # The base loaders have slots of their own and Python won't let two
+    # bases of a class both add slots. Loaders using this mixin declare its
+    # state in their own __slots__ instead.
+    __slots__ = ()
+    LIVE_SLOTS = (
+        "_watcher",
+        "_file_path",
+        "_running",
+        "_locale",
+        "_kwargs",
+        "_signature",
+        "_digest",
+        "_watch_alias",
+        "_content",
+        "_pending",
+    )
+
     THING = "file"
 
+    # Time (in seconds) during which the file must not receive any event
+    # before being reloaded
+    DEBOUNCE_DELAY = 0.05
+
     def __init__(self, *args, **kwargs):
         # noinspection PyArgumentList
         super(LiveFileLoaderMixin, self).__init__(*args, **kwargs)
@@ -32,6 +91,11 @@ class LiveFileLoaderMixin(object):
         self._running = False
         self._locale = None
         self._kwargs = {}
+        self._signature = None
+        self._digest = None
+        self._watch_alias = None
+        self._content = None
+        self._pending = None
 
     async def _load(self):
         """
@@ -41,22 +105,220 @@ class LiveFileLoaderMixin(object):
 
         raise NotImplementedError
 
+    def _parse(self, content: bytes) -> Any:
+        """
+        Parses the content of the file. Implementing it allows `_load()` to
+        use `_parse_cached()`, which runs it in the default executor and
+        shares its result with other loaders parsing the same content. So
+        the result must only depend on the content and on the loader's
+        parameters, and must not be modified by listeners.
+        """
+
+        raise NotImplementedError
+
+    def _read_with_digest(self) -> Tuple[bytes, bytes]:
+        """
+        Reads the content of the file along with its digest. If the content
+        was just read to check if it changed, its digest is known already.
+        """
+
+        if self._content is not None:
+            return self._read(), self._digest
+
+        content = self._read()
+        return content, hashlib.blake2b(content, digest_size=16).digest()
+
+    async def _parse_cached(self) -> Any:
+        """
+        Reads and parses the file in the default executor, unless the same
+        content was already parsed with the same parameters.
+        """
+
+        loop = asyncio.get_event_loop()
+        content, digest = await loop.run_in_executor(None, self._read_with_digest)
+        key = (self.__class__, digest, self._locale, repr(self._kwargs))
+
+        try:
+            _parsed.move_to_end(key)
+            return _parsed[key]
+        except KeyError:
+            pass
+
+        result = await loop.run_in_executor(None, self._parse, content)
+        _parsed[key] = result
+
+        while len(_parsed) > _PARSED_CACHE_SIZE:
+            _parsed.popitem(last=False)
+
+        return result
+
+    @classmethod
+    def clear_cache(cls) -> None:
+        """
+        Forgets all the parsed content shared between loaders.
+        """
+
+        _parsed.clear()
+
+    def _read(self) -> bytes:
+        """
+        Reads the content of the file. If it was just read to check if it
+        changed then that content is used instead of reading it again.
+        """
+
+        content, self._content = self._content, None
+
+        if content is None:
+            with open(self._file_path, "rb") as f:
+                content = f.read()
+
+        return content
+
+    def _has_changed(self, notified: bool = False) -> bool:
+        """
+        Tells if the file changed since the last time this was called. The
+        content itself is compared, because editors and deploy tools often
+        touch files without changing them.
+
+        When the watcher reported a write, the content is always compared:
+        the modification time is too coarse on some file systems to tell
+        apart two writes of the same size. Otherwise, an unchanged
+        modification time and size is enough to skip reading the file.
+
+        :param notified: The watcher reported a change of the file
+        """
+
+        try:
+            st = os.stat(self._file_path)
+        except OSError:
+            # The file is being replaced, the next event will tell when it's
+            # back in place.
+            return False
+
+        signature = (st.st_mtime_ns, st.st_size)
+
+        if not notified and signature == self._signature:
+            return False
+
+        with open(self._file_path, "rb") as f:
+            content = f.read()
+
+        digest = hashlib.blake2b(content, digest_size=16).digest()
+        self._signature = signature
+
+        if digest == self._digest:
+            return False
+
+        self._digest = digest
+        self._content = content
+        return True
+
+    def _watch_file(self) -> None:
+        """
+        Watch the file itself rather than its directory, so that changes to
+        the files around it don't wake the loader up. Each watch gets its own
+        alias because the ones removed by the system stay known by the
+        watcher.
+        """
+
+        self._watch_alias = f"{self._file_path}#{next(_watch_ids)}"
+        self._watcher.watch(
+            path=self._file_path,
+            flags=(
+                aionotify.Flags.CLOSE_WRITE
+                | aionotify.Flags.DELETE_SELF
+                | aionotify.Flags.MOVE_SELF
+            ),
+            alias=self._watch_alias,
+        )
+
+    async def _rewatch(self, moved: bool) -> None:
+        """
+        Most editors save by replacing the file with a new one, which takes
+        the watch away with the old file. Wait for the new file to be in
+        place and watch it instead.
+
+        :param moved: The old file was moved away rather than deleted, so
+                      its watch has to be removed
+        """
+
+        if moved:
+            try:
+                self._watcher.unwatch(self._watch_alias)
+            except (IOError, ValueError):
+                pass
+
+        delay = 0.01
+
+        while self._running:
+            try:
+                self._watch_file()
+            except IOError:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 1.0)
+            else:
+                return
+
+    async def _next_event(self, timeout: Optional[float] = None):
+        """
+        Wait for the next event of the watcher, or for the timeout to expire
+        in which case None is returned. On timeout the wait is not cancelled,
+        as it could cut an event in half, but picked up by the next call.
+        """
+
+        if self._pending is None:
+            self._pending = asyncio.ensure_future(self._watcher.get_event())
+
+        done, _ = await asyncio.wait([self._pending], timeout=timeout)
+
+        if done:
+            pending, self._pending = self._pending, None
+            return pending.result()
+
+    async def _on_event(self, evt) -> bool:
+        """
+        Handles an event and tells if it might mean that the file changed.
+        """
+
+        if evt.flags & (aionotify.Flags.DELETE_SELF | aionotify.Flags.MOVE_SELF):
+            await self._rewatch(bool(evt.flags & aionotify.Flags.MOVE_SELF))
+            return True
+
+        return bool(evt.flags & aionotify.Flags.CLOSE_WRITE)
+
     async def _watch(self):
         """
         Start the watching loop.
         """
 
-        file_name = os.path.basename(self._file_path)
         logger.info(
             'Watching %s "%s"',
             self.THING,
             self._file_path,
         )
 
+        loop = asyncio.get_event_loop()
+
         while self._running:
-            evt = await self._watcher.get_event()
+            evt = await self._next_event()
+
+            if evt is None:
+                break
+
+            if not await self._on_event(evt):
+                continue
+
+            # Saving a file often comes as a burst of events, so wait for
+            # things to settle down before reloading.
+            while True:
+                evt = await self._next_event(self.DEBOUNCE_DELAY)
+
+                if evt is None:
+                    break
+
+                await self._on_event(evt)
 
-            if evt.name == file_name:
+            if await loop.run_in_executor(None, self._has_changed, True):
                 await self._load()
                 logger.info(
                     'Reloading changed %s from "%s"', self.THING, self._file_path
@@ -75,14 +337,13 @@ class LiveFileLoaderMixin(object):
             self._kwargs = kwargs
 
         if settings.I18N_LIVE_RELOAD:
+            self._has_changed()
+
             loop = asyncio.get_event_loop()
 
             self._running = True
             self._watcher = aionotify.Watcher()
-            self._watcher.watch(
-                path=os.path.dirname(self._file_path),
-                flags=aionotify.Flags.MOVED_TO | aionotify.Flags.MODIFY,
-            )
+            self._watch_file()
             await self._watcher.setup(loop)
             await self._load()
 
@@ -100,6 +361,8 @@ class BaseTranslationLoader(object):
     update event. It must NOT finish before the update is done.
     """
 
+    __slots__ = ("listeners",)
+
     def __init__(self):
         self.listeners = []  # type: List[Callable[[TransDict]], None]
 
@@ -135,11 +398,14 @@ class CsvTranslationLoader(LiveFileLoaderMixin, BaseTranslationLoader):
     Loads data from a CSV file
     """
 
+    __slots__ = LiveFileLoaderMixin.LIVE_SLOTS
+
     THING = "CSV translation"
 
-    async def _load(self):
+    def _parse(self, content: bytes) -> List[Tuple[TransDict, Dict]]:
         """
-        Load data from a Excel-formatted CSV file.
+        Parses the file into one update per set of flags. This runs in a
+        thread, away from the event loop.
         """
 
         flags = self._kwargs.get("flags")
@@ -148,22 +414,47 @@ class CsvTranslationLoader(LiveFileLoaderMixin, BaseTranslationLoader):
             flags = {1: {}}
 
         cols = {k: [] for k in flags.keys()}
+        rows = _parse_csv(content)
 
-        with open(self._file_path, newline="", encoding="utf-8") as f:
-            reader = csv.reader(f)
+        if len(cols) == 1:
+            # Most catalogs only have one column of translations, which
+            # doesn't need the loop over columns for each row.
+            [(i, col)] = cols.items()
+            append = col.append
+
+            for row in rows:
+                if i < len(row):
+                    val = row[i].strip()
+
+                    if val:
+                        append((row[0], val))
+        else:
+            appenders = [(i, col.append) for i, col in cols.items()]
 
-            for row in reader:
-                for i, col in cols.items():
-                    try:
+            for row in rows:
+                if not row:
+                    continue
+
+                key = row[0]
+                row_len = len(row)
+
+                for i, append in appenders:
+                    if i < row_len:
                         val = row[i].strip()
-                        assert val
-                    except (IndexError, AssertionError):
-                        pass
-                    else:
-                        col.append((row[0], val))
 
-        for i, col in cols.items():
-            self._update({self._locale: col}, flags[i])
+                        if val:
+                            append((key, val))
+
+        return [({self._locale: col}, flags[i]) for i, col in cols.items()]
+
+    async def _load(self):
+        """
+        Load data from a Excel-formatted CSV file. Parsing happens in the
+        default executor so the bot keeps answering in the meantime.
+        """
+
+        for data, flags in await self._parse_cached():
+            self._update(data, flags)
 
     async def load(self, file_path, locale=None, flags=None):
         """
@@ -182,6 +473,8 @@ class BaseIntentsLoader(object):
     update event. It must NOT finish before the update is done.
     """
 
+    __slots__ = ("listeners",)
+
     def __init__(self):
         self.listeners = []  # type: List[Callable[[IntentDict]], None]
 
@@ -220,6 +513,15 @@ ColRanges = List[
 ]
 
 
+def _normalize_ranges(ranges: ColRanges) -> List[Tuple[int, Optional[int]]]:
+    """
+    Turns all the ranges into (start, end) tuples, so that it's done once
+    instead of for each row.
+    """
+
+    return [(r, r + 1) if isinstance(r, int) else (r[0], r[1]) for r in ranges]
+
+
 def extract_ranges(row, ranges: ColRanges) -> List[Text]:
     """
     Extracts a list of ranges from a row:
@@ -231,17 +533,21 @@ def extract_ranges(row, ranges: ColRanges) -> List[Text]:
     """
 
     out = []
+    append = out.append
 
     for r in ranges:
         if isinstance(r, int):
-            r = (r, r + 1)
+            cells = row[r : r + 1]
+        else:
+            cells = row[r[0] : r[1]]
 
-        if r[1] is None:
-            r = (r[0], len(row))
+        for cell in cells:
+            cell = cell.strip()
 
-        out.extend(row[r[0] : r[1]])
+            if cell:
+                append(cell)
 
-    return [x for x in (y.strip() for y in out) if x]
+    return out
 
 
 class CsvIntentsLoader(LiveFileLoaderMixin, BaseIntentsLoader):
@@ -249,30 +555,49 @@ class CsvIntentsLoader(LiveFileLoaderMixin, BaseIntentsLoader):
     Load intents from a CSV
     """
 
+    __slots__ = LiveFileLoaderMixin.LIVE_SLOTS
+
     THING = "CSV intents"
 
-    async def _load(self):
+    def _parse(self, content: bytes) -> IntentDict:
         """
-        Load data from a Excel-formatted CSV file.
+        Parses the file. This runs in a thread, away from the event loop.
         """
 
         key = self._kwargs["key"]
-        pos = self._kwargs["pos"]
-        neg = self._kwargs["neg"]
-
-        with open(self._file_path, newline="", encoding="utf-8") as f:
-            reader = csv.reader(f)
-            data = {}
-
-            for row in reader:
-                try:
-                    data[row[key]] = data.get(row[key], []) + [
-                        tuple(extract_ranges(row, [pos] + neg))
-                    ]
-                except IndexError:
-                    pass
-
-        self._update({self._locale: data})
+        ranges = _normalize_ranges([self._kwargs["pos"]] + self._kwargs["neg"])
+
+        data = {}
+
+        for row in _parse_csv(content):
+            try:
+                intent = row[key]
+            except IndexError:
+                continue
+
+            # Same as extract_ranges(), inlined because it's the hot loop of
+            # intents loading
+            cells = []
+            append = cells.append
+
+            for start, end in ranges:
+                for cell in row[start:end]:
+                    cell = cell.strip()
+
+                    if cell:
+                        append(cell)
+
+            data.setdefault(intent, []).append(tuple(cells))
+
+        return {self._locale: data}
+
+    async def _load(self):
+        """
+        Load data from a Excel-formatted CSV file. Parsing happens in the
+        default executor so the bot keeps answering in the meantime.
+        """
+
+        self._update(await self._parse_cached())
 
     async def load(
         self,
@@ -1,11 +1,14 @@
-from collections import defaultdict
-from itertools import zip_longest
-from random import SystemRandom
+import asyncio
+import sys
+from functools import lru_cache
+from random import Random, SystemRandom
 from string import Formatter
 from typing import (
     TYPE_CHECKING,
     Any,
     Dict,
+    FrozenSet,
+    Iterable,
     List,
     Mapping,
     NamedTuple,
@@ -15,22 +18,174 @@ from typing import (
     Union,
 )
 
+from _string import formatter_field_name_split
+
 from bernard.conf import settings
-from bernard.i18n.loaders import TransDict
 from bernard.utils import import_class, run
 
 from ._formatter import I18nFormatter
-from .loaders import BaseTranslationLoader
+from .loaders import BaseTranslationLoader, TransDict
 from .utils import LocalesDict
 
 if TYPE_CHECKING:
     from bernard.engine.request import Request
 
 
-random = SystemRandom()
+# Choosing between phrasings doesn't need a cryptographic generator, which
+# would cost a system call for each choice
+random = Random()
+_system_random = SystemRandom()
+
+
+def _configured_random() -> Random:
+    """
+    Generator to pick between phrasings with, depending on the
+    I18N_USE_SYSTEM_RANDOM setting.
+    """
+
+    if settings.I18N_USE_SYSTEM_RANDOM:
+        return _system_random
+
+    return random
 
 
 Flags = Dict[Text, Text]
+FrozenFlags = FrozenSet[Tuple[Text, Text]]
+
+_NO_FLAGS: FrozenFlags = frozenset()
+
+
+def _freeze_flags(flags: Optional[Flags]) -> FrozenFlags:
+    """
+    Hashable form of the flags, used to cache what depends on them
+    """
+
+    if not flags:
+        return _NO_FLAGS
+
+    return frozenset(flags.items())
+
+
+# Attribute (True) or item (False) accesses to apply on a field's value, like
+# `user.name` or `user[name]`
+FieldPath = Tuple[Tuple[bool, Union[Text, int]], ...]
+
+# Parsed template: either the text itself if it has no field, either a tuple
+# of (literal, param name, access path, format spec, conversion), which is
+# what `Formatter.parse()` produces with the field names already split.
+CompiledTemplate = Union[
+    Text, Tuple[Tuple[Text, Optional[Text], FieldPath, Text, Text], ...]
+]
+
+
+@lru_cache(maxsize=8192)
+def _compile_template(template: Text) -> Optional[CompiledTemplate]:
+    """
+    Parses a template once for all the times it's going to be rendered.
+    Templates using positional or nested fields can't be compiled, in which
+    case None is returned and they are left to the formatter.
+    """
+
+    parts = []
+
+    for literal, field, spec, conversion in Formatter().parse(template):
+        if field is not None:
+            if "{" in spec:
+                return
+
+            first, rest = formatter_field_name_split(field)
+
+            if not isinstance(first, str) or not first.isidentifier():
+                return
+
+            parts.append((literal, first, tuple(rest), spec, conversion))
+        elif literal:
+            parts.append((literal, None, (), "", ""))
+
+    if all(part[1] is None for part in parts):
+        return "".join(part[0] for part in parts)
+
+    return tuple(parts)
+
+
+def _format_template(formatter: Formatter, template: Text, params: Dict) -> Text:
+    """
+    Same as `formatter.format(template, **params)` but using the compiled
+    template, which avoids parsing it again each time.
+    """
+
+    compiled = _compile_template(template)
+
+    if compiled is None:
+        return formatter.format(template, **params)
+    elif isinstance(compiled, str):
+        return compiled
+
+    out = []
+    append = out.append
+    format_field = formatter.format_field
+
+    for literal, field, path, spec, conversion in compiled:
+        append(literal)
+
+        if field is not None:
+            value = params[field]
+
+            for is_attr, key in path:
+                value = getattr(value, key) if is_attr else value[key]
+
+            if conversion:
+                value = formatter.convert_field(value, conversion)
+
+            append(format_field(value, spec))
+
+    return "".join(out)
+
+
+# Params of these exact types always format the same way, so the result of the
+# formatting can be cached
+_CACHEABLE_PARAM_TYPES = frozenset({str, int, float, bool})
+
+
+def _params_key(params: Dict[Text, Any]) -> Optional[Tuple]:
+    """
+    Hashable form of the params if they are all simple values, or None if
+    formatting with them can't be cached. Types are part of the key since
+    1, 1.0 and True are equal but don't format the same way.
+    """
+
+    if not params:
+        return
+
+    for value in params.values():
+        if type(value) not in _CACHEABLE_PARAM_TYPES:
+            return
+
+    return tuple((k, type(v), v) for k, v in params.items())
+
+
+# Formatters only depend on the locale and the time zone, of which there are
+# few combinations. Time zones are not always hashable (dateutil's aren't) so
+# they are keyed by identity, the cached formatter keeping them alive.
+_FORMATTERS_CACHE_SIZE = 256
+_formatters: Dict[Tuple[Optional[Text], int], I18nFormatter] = {}
+
+
+def _get_formatter(locale: Optional[Text], tz) -> I18nFormatter:
+    """
+    Returns the formatter for this locale and time zone, creating it if needed.
+    """
+
+    key = (locale, id(tz))
+
+    try:
+        return _formatters[key]
+    except KeyError:
+        if len(_formatters) >= _FORMATTERS_CACHE_SIZE:
+            _formatters.clear()
+
+        f = _formatters[key] = I18nFormatter(locale, tz)
+        return f
 
 
 class TranslationError(Exception):
@@ -92,8 +247,30 @@ class Sentence(object):
     get a random sentence from the list and to see if the list is valid.
     """
 
+    __slots__ = ("items", "_buckets")
+
     def __init__(self):
         self.items: List[TransItem] = []
+        self._buckets: Optional[List[Tuple[FrozenFlags, List[TransItem]]]] = None
+
+    def _make_buckets(self) -> List[Tuple[FrozenFlags, List[TransItem]]]:
+        """
+        Groups items by flags. All the items of a bucket have the same score
+        for any given flags, so only one of them needs to be scored. Buckets
+        come with their frozen flags, against which the score is computed.
+        """
+
+        buckets: Dict[FrozenFlags, List[TransItem]] = {}
+
+        for item in self.items:
+            key = frozenset(item.flags.items())
+
+            try:
+                buckets[key].append(item)
+            except KeyError:
+                buckets[key] = [item]
+
+        return list(buckets.items())
 
     def best_for_flags(self, flags: Flags) -> List[TransItem]:
         """
@@ -101,25 +278,71 @@ class Sentence(object):
         matching score and put them in a list.
         """
 
-        best_score: int = 0
+        return list(self._lookup_bucket(flags))
+
+    def _lookup_bucket(
+        self, flags: Flags, frozen_flags: Optional[FrozenFlags] = None
+    ) -> List[TransItem]:
+        """
+        Same as `best_for_flags()` but the returned list might be an internal
+        bucket, so it must not be modified.
+
+        The score of a bucket is the number of flags it has in common with
+        the requested flags, which is the size of the intersection of their
+        frozen forms.
+        """
+
+        if self._buckets is None:
+            self._buckets = self._make_buckets()
+
+        buckets = self._buckets
+
+        # Most sentences don't have flagged variants, in which case there is
+        # nothing to choose
+        if len(buckets) == 1:
+            return buckets[0][1]
+
+        if frozen_flags is None:
+            frozen_flags = _freeze_flags(flags)
+
+        best_score: int = -1
         best_list: List[TransItem] = []
+        copied = False
 
-        for item in self.items:
-            score = item.score(flags)
+        for bucket_flags, bucket in buckets:
+            score = len(bucket_flags & frozen_flags)
 
-            if score == best_score:
-                best_list.append(item)
-            elif score > best_score:
-                best_list = [item]
+            if score > best_score:
+                best_list = bucket
                 best_score = score
+                copied = False
+            elif score == best_score:
+                # The winning bucket is only copied when it has to be merged
+                # with another one
+                if not copied:
+                    best_list = list(best_list)
+                    copied = True
+
+                best_list.extend(bucket)
 
         return best_list
 
-    def render(self, flags: Flags) -> Text:
+    def render(self, flags: Flags, rng: Optional[Random] = None) -> Text:
         """
         Chooses a random sentence from the list and returns it.
+
+        :param flags: Flags to choose the sentence with
+        :param rng: Random generator to use, by default the configured one
         """
-        return random.choice(self.best_for_flags(flags)).value
+        bucket = self._lookup_bucket(flags)
+
+        if len(bucket) == 1:
+            return bucket[0].value
+
+        if rng is None:
+            rng = _configured_random()
+
+        return rng.choice(bucket).value
 
     def append(self, item: TransItem):
         """
@@ -127,6 +350,7 @@ class Sentence(object):
         object is consistent with the others in the list.
         """
         self.items.append(item)
+        self._buckets = None
 
     def check(self):
         """
@@ -143,6 +367,7 @@ class Sentence(object):
         items = [i for i in self.items if i.flags != flags]
         items.extend(new.items)
         self.items = items
+        self._buckets = None
 
 
 class SentenceGroup(object):
@@ -157,15 +382,23 @@ class SentenceGroup(object):
     Order of insertion does not matter.
     """
 
+    __slots__ = ("sentences",)
+
     def __init__(self):
         self.sentences: List[Sentence] = []
 
-    def render(self, flags: Flags) -> List[Text]:
+    def render(self, flags: Flags, rng: Optional[Random] = None) -> List[Text]:
         """
         Returns a list of randomly chosen outcomes for each sentence of the
         list.
+
+        :param flags: Flags to choose the sentences with
+        :param rng: Random generator to use, by default the configured one
         """
-        return [x.render(flags) for x in self.sentences]
+        if rng is None:
+            rng = _configured_random()
+
+        return [x.render(flags, rng) for x in self.sentences]
 
     def append(self, item: TransItem):
         """
@@ -194,19 +427,23 @@ class SentenceGroup(object):
         will be overwritten by the content of the specified group.
         """
 
-        to_append = []
-
-        for old, new in zip_longest(self.sentences, group.sentences):
-            if old is None:
-                old = Sentence()
-                to_append.append(old)
+        sentences = self.sentences
+        n_old = len(sentences)
+        n_new = len(group.sentences)
 
-            if new is None:
-                new = Sentence()
+        if n_new > n_old:
+            sentences.extend(Sentence() for _ in range(n_new - n_old))
 
+        for old, new in zip(sentences, group.sentences):
             old.update(new, flags)
 
-        self.sentences.extend(to_append)
+        # Sentences that the new group doesn't have anymore only lose the
+        # items of these flags
+        if n_old > n_new:
+            empty = Sentence()
+
+            for i in range(n_new, n_old):
+                sentences[i].update(empty, flags)
 
 
 class SortingDict(object):
@@ -216,27 +453,29 @@ class SortingDict(object):
     valid keys out. Then you can discard this object.
     """
 
+    __slots__ = ("data",)
+
     def __init__(self):
-        self.data: Dict[Text, SentenceGroup] = defaultdict(lambda: SentenceGroup())
+        self.data: Dict[Text, SentenceGroup] = {}
 
     def extract(self):
         """
         Extract only the valid sentence groups into a dictionary.
         """
 
-        out = {}
-
-        for key, group in self.data.items():
-            out[key] = group
-
-        return out
+        return dict(self.data)
 
     def append(self, item: TransItem):
         """
         Append an item to the internal dictionary.
         """
 
-        self.data[item.key].append(item)
+        try:
+            group = self.data[item.key]
+        except KeyError:
+            group = self.data[item.key] = SentenceGroup()
+
+        group.append(item)
 
 
 class WordDictionary(LocalesDict):
@@ -245,9 +484,20 @@ class WordDictionary(LocalesDict):
     memory, puts the parameters in place and so on.
     """
 
+    # Maximum number of (key, locale, flags) combinations for which the
+    # candidates are kept
+    CANDIDATES_CACHE_SIZE = 4096
+
+    # Maximum number of formatted (formatter, template, params) combinations
+    # which are kept
+    FORMATTED_CACHE_SIZE = 4096
+
     def __init__(self):
         super(WordDictionary, self).__init__()
         self.loaders = []  # type: List[BaseTranslationLoader]
+        self._candidates = {}  # type: Dict[Tuple, List[List[Text]]]
+        self._formatted = {}  # type: Dict[Tuple, Text]
+        self.random = _configured_random()
         self._init_loaders()
 
     def _init_loaders(self) -> None:
@@ -266,24 +516,21 @@ class WordDictionary(LocalesDict):
         Parse an item (and more specifically its key).
         """
 
-        parts = key.split("+")
-        pure_key = parts[0]
+        pure_key, sep, tail = key.rpartition("+")
 
-        try:
-            if len(parts) == 2:
-                index = int(parts[1])
-            elif len(parts) > 2:
-                return
-            else:
-                index = 1
-        except (ValueError, TypeError):
+        if not sep:
+            pure_key = key
+            index = 1
+        elif "+" in pure_key or not tail.isdecimal():
             return
+        else:
+            index = int(tail)
 
-        if index < 1:
-            return
+            if index < 1:
+                return
 
         return TransItem(
-            key=pure_key,
+            key=sys.intern(pure_key),
             index=index,
             value=value,
             flags=flags,
@@ -296,6 +543,12 @@ class WordDictionary(LocalesDict):
         Update translations for one specific lang
         """
 
+        # All items share the same flags dict, with interned keys and values
+        # so they are compared by identity when translations get scored.
+        flags = {
+            sys.intern(k): sys.intern(v) if isinstance(v, str) else v
+            for k, v in flags.items()
+        }
         sd = SortingDict()
 
         for item in (self.parse_item(x[0], x[1], flags) for x in data):
@@ -303,15 +556,25 @@ class WordDictionary(LocalesDict):
                 sd.append(item)
 
         if lang not in self.dict:
-            self.dict[lang] = {}
+            self.add_locale(lang)
 
         d = self.dict[lang]
+        groups = sd.extract()
 
-        for k, v in sd.extract().items():
-            if k not in d:
-                d[k] = SentenceGroup()
+        if not d:
+            # First load of this locale, there is nothing to merge with
+            d.update(groups)
+        else:
+            for k, v in groups.items():
+                group = d.get(k)
+
+                if group is None:
+                    # Merging into an empty group would only copy this one
+                    d[k] = v
+                else:
+                    group.update(v, flags)
 
-            d[k].update(v, flags)
+        self._candidates.clear()
 
     def update(self, data: TransDict, flags: Flags):
         """
@@ -321,6 +584,63 @@ class WordDictionary(LocalesDict):
         for lang, lang_data in data.items():
             self.update_lang(lang, lang_data, flags)
 
+    def _get_candidates(
+        self,
+        key: Text,
+        locale: Optional[Text],
+        flags: Flags,
+        frozen_flags: FrozenFlags,
+    ) -> List[List[Text]]:
+        """
+        For each sentence of a translation, lists the values that fit best
+        with the flags. This is cached until the next update.
+
+        :raise KeyError: the translation does not exist
+        """
+
+        cache_key = (key, locale, frozen_flags)
+
+        try:
+            return self._candidates[cache_key]
+        except KeyError:
+            pass
+
+        group: SentenceGroup = self.dict[locale][key]
+        candidates = [
+            [item.value for item in sentence._lookup_bucket(flags, frozen_flags)]
+            for sentence in group.sentences
+        ]
+
+        if len(self._candidates) >= self.CANDIDATES_CACHE_SIZE:
+            self._candidates.clear()
+
+        self._candidates[cache_key] = candidates
+        return candidates
+
+    def _format_cached(
+        self, formatter: Formatter, line: Text, params: Dict, params_key: Tuple
+    ) -> Text:
+        """
+        Formats the line like `_format_template()` does but keeps the result.
+        The formatter is part of the cache key, which keeps it alive and thus
+        its identity can't be reused by another formatter.
+        """
+
+        cache_key = (formatter, line, params_key)
+
+        try:
+            return self._formatted[cache_key]
+        except KeyError:
+            pass
+
+        text = _format_template(formatter, line, params)
+
+        if len(self._formatted) >= self.FORMATTED_CACHE_SIZE:
+            self._formatted.clear()
+
+        self._formatted[cache_key] = text
+        return text
+
     def get(
         self,
         key: Text,
@@ -329,6 +649,7 @@ class WordDictionary(LocalesDict):
         locale: Text = None,
         params: Optional[Dict[Text, Any]] = None,
         flags: Optional[Flags] = None,
+        frozen_flags: Optional[FrozenFlags] = None,
     ) -> List[Text]:
         """
         Get the appropriate translation given the specified parameters.
@@ -339,6 +660,7 @@ class WordDictionary(LocalesDict):
         :param locale: Prefered locale to get the string from
         :param params: Params to be substituted
         :param flags: Flags to help choosing one version or the other
+        :param frozen_flags: Hashable form of `flags`, if it's already known
         """
 
         if params is None:
@@ -349,20 +671,33 @@ class WordDictionary(LocalesDict):
 
         locale = self.choose_locale(locale)
 
+        if frozen_flags is None:
+            frozen_flags = _freeze_flags(flags)
+
         try:
-            group: SentenceGroup = self.dict[locale][key]
+            candidates = self._get_candidates(key, locale, flags or {}, frozen_flags)
         except KeyError:
             raise MissingTranslationError('Translation "{}" does not exist'.format(key))
 
+        params_key = _params_key(params) if formatter else None
+
         try:
-            trans = group.render(flags or {})
             out = []
 
-            for line in trans:
+            for choices in candidates:
+                # Most sentences have only one candidate, in which case there
+                # is no need to draw a random number
+                if len(choices) == 1:
+                    line = choices[0]
+                else:
+                    line = self.random.choice(choices)
+
                 if not formatter:
                     out.append(line.format(**params))
+                elif params_key is None:
+                    out.append(_format_template(formatter, line, params))
                 else:
-                    out.append(formatter.format(line, **params))
+                    out.append(self._format_cached(formatter, line, params, params_key))
         except KeyError as e:
             raise MissingParamError(
                 'Parameter "{}" missing to translate "{}"'.format(e.args[0], key)
@@ -377,6 +712,8 @@ class StringToTranslate(object):
     rendered.
     """
 
+    __slots__ = ("wd", "key", "count", "params")
+
     LINE_SEPARATOR = "\n"
 
     def __init__(
@@ -421,13 +758,16 @@ class StringToTranslate(object):
         at this moment.
         """
 
-        out = {}
+        out = dict(params)
+        pending = [k for k, v in params.items() if isinstance(v, StringToTranslate)]
 
-        for k, v in params.items():
-            if isinstance(v, StringToTranslate):
-                out[k] = await render(v, request)
-            else:
-                out[k] = v
+        if len(pending) == 1:
+            out[pending[0]] = await render(params[pending[0]], request)
+        elif pending:
+            rendered = await asyncio.gather(
+                *(render(params[k], request) for k in pending)
+            )
+            out.update(zip(pending, rendered))
 
         return out
 
@@ -450,34 +790,90 @@ class StringToTranslate(object):
 
         :param request: Bot request.
         """
-        from bernard.middleware import MiddlewareManager
 
-        if request:
-            tz = await request.user.get_timezone()
-            locale = await request.get_locale()
-            flags = await request.get_trans_flags()
+        if request is None:
+            ctx = _RenderContext(None, None, {})
         else:
-            tz = None
+            ctx = await _RenderContext.make(request)
+
+        return await self._render_list_in(request, ctx)
+
+    async def _render_list_in(
+        self, request: Optional["Request"], ctx: "_RenderContext"
+    ) -> List[Text]:
+        """
+        Does the actual work of `render_list()` once the request-wide
+        information has been fetched.
+
+        :param request: Bot request.
+        :param ctx: Timezone, locale and flags of that request
+        """
+        from bernard.middleware import MiddlewareManager
+
+        locale = ctx.locale
+
+        if locale is None:
             locale = self.wd.list_locales()[0]
-            flags = {}
 
-        rp = MiddlewareManager.instance().get(
-            "resolve_trans_params", self._resolve_params
-        )
+        mm = MiddlewareManager.instance()
 
-        resolved_params = await rp(self.params, request)
+        # Static strings are by far the most common ones, there is nothing to
+        # resolve unless a middleware wants to add its own params.
+        if self.params or mm.implements("resolve_trans_params"):
+            rp = mm.get("resolve_trans_params", self._resolve_params)
+            resolved_params = await rp(self.params, request)
+        else:
+            resolved_params = {}
 
-        f = I18nFormatter(self.wd.choose_locale(locale), tz)
+        f = ctx.formatter(self.wd.choose_locale(locale))
         return self.wd.get(
             self.key,
             self.count,
             f,
             locale,
             resolved_params,
-            flags,
+            ctx.flags,
+            ctx.frozen_flags,
         )
 
 
+class _RenderContext(object):
+    """
+    Everything that a translation needs to know about the request it is
+    rendered for. It is fetched once and can then be shared between several
+    strings.
+    """
+
+    def __init__(self, tz, locale: Optional[Text], flags: Flags):
+        self.tz = tz
+        self.locale = locale
+        self.flags = flags
+        self.frozen_flags = _freeze_flags(flags)
+
+    @classmethod
+    async def make(cls, request: Optional["Request"]) -> "_RenderContext":
+        """
+        Fetch the timezone, locale and flags of the request. If there is no
+        request then the locale is left to the word dictionary to choose.
+        """
+
+        if request:
+            return cls(
+                await request.user.get_timezone(),
+                await request.get_locale(),
+                await request.get_trans_flags(),
+            )
+        else:
+            return cls(None, None, {})
+
+    def formatter(self, locale: Optional[Text]) -> I18nFormatter:
+        """
+        Formatter for the given (already chosen) locale
+        """
+
+        return _get_formatter(locale, self.tz)
+
+
 class Translator(object):
     """
     That's the basic object that you use to produce translations.
@@ -510,7 +906,10 @@ class Translator(object):
         :param key: Key to get
         """
 
-        return self(key)
+        # Each caller gets its own string, which callers are free to modify.
+        # It's built directly rather than through __call__() to skip packing
+        # the keyword arguments.
+        return StringToTranslate(self.wd, key, None, {})
 
     def __call__(
         self, key: Text, count: Optional[int] = None, **params
@@ -546,7 +945,7 @@ def serialize(text: TransText):
             "type": "trans",
             "key": text.key,
             "count": text.count,
-            "params": text.params,
+            "params": dict(text.params),
         }
     else:
         raise ValueError('Cannot accept type "{}"'.format(text.__class__.__name__))
@@ -557,7 +956,8 @@ def unserialize(wd: WordDictionary, text: Dict):
     Transforms back a serialized value of `serialize()`
     """
 
-    if not isinstance(text, Mapping):
+    # Checking against the Mapping ABC is slow and it's almost always a dict
+    if type(text) is not dict and not isinstance(text, Mapping):
         raise ValueError("Text has not the right format")
 
     try:
@@ -566,10 +966,12 @@ def unserialize(wd: WordDictionary, text: Dict):
         if t == "string":
             return text["value"]
         elif t == "trans":
-            if not isinstance(text["params"], Mapping):
+            params = text["params"]
+
+            if type(params) is not dict and not isinstance(params, Mapping):
                 raise ValueError("Params should be a dictionary")
 
-            for param in text["params"]:
+            for param in params:
                 if not isinstance(param, str):
                     raise ValueError("Params are not all text-keys")
 
@@ -577,7 +979,7 @@ def unserialize(wd: WordDictionary, text: Dict):
                 wd=wd,
                 key=text["key"],
                 count=text["count"],
-                params=text["params"],
+                params=params,
             )
         else:
             raise ValueError('Unknown type "{}"'.format(t))
@@ -604,3 +1006,29 @@ async def render(
         return out
     else:
         return " ".join(out)
+
+
+async def render_many(
+    texts: Iterable[TransText], request: Optional["Request"]
+) -> List[Text]:
+    """
+    Same as `render()` but for several texts at once. The timezone, locale
+    and flags of the request are only fetched once for all of them instead
+    of once per text.
+    """
+
+    out = []
+    ctx = None
+
+    for text in texts:
+        if isinstance(text, str):
+            out.append(text)
+        elif isinstance(text, StringToTranslate):
+            if ctx is None:
+                ctx = await _RenderContext.make(request)
+
+            out.append(" ".join(await text._render_list_in(request, ctx)))
+        else:
+            raise TypeError("Provided text cannot be rendered")
+
+    return out
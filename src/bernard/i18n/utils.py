@@ -1,8 +1,12 @@
 import re
 from collections import OrderedDict
+from functools import lru_cache
 from typing import Dict, List, Optional, Text, Tuple
 
+_LOCALE_SEPARATOR = re.compile(r"[_\-]")
 
+
+@lru_cache(maxsize=256)
 def split_locale(locale: Text) -> Tuple[Text, Optional[Text]]:
     """
     Decompose the locale into a normalized tuple.
@@ -11,7 +15,7 @@ def split_locale(locale: Text) -> Tuple[Text, Optional[Text]]:
     is either the country as lower case either None if no country was supplied.
     """
 
-    items = re.split(r"[_\-]", locale.lower(), 1)
+    items = _LOCALE_SEPARATOR.split(locale.lower(), 1)
 
     try:
         return items[0], items[1]
@@ -19,6 +23,7 @@ def split_locale(locale: Text) -> Tuple[Text, Optional[Text]]:
         return items[0], None
 
 
+@lru_cache(maxsize=1024)
 def compare_locales(a, b):
     """
     Compares two locales to find the level of compatibility
@@ -50,6 +55,13 @@ class LocalesDict(object):
         self.dict = OrderedDict()
         self._choice_cache = {}
 
+        # First locale for each normalized locale and for each language, so
+        # choosing a locale doesn't need to compare it with all the others.
+        # They are built again from `dict` when its locales change.
+        self._by_locale = {}  # type: Dict[Tuple[Text, Optional[Text]], Text]
+        self._by_lang = {}  # type: Dict[Text, Text]
+        self._indexed = []  # type: List[Optional[Text]]
+
     def list_locales(self) -> List[Optional[Text]]:
         """
         Returns the list of available locales. The first locale is the default
@@ -64,30 +76,70 @@ class LocalesDict(object):
 
         return locales
 
+    def add_locale(self, locale: Optional[Text]) -> None:
+        """
+        Creates the data of a new locale. Locales chosen so far are forgotten
+        since the new locale might be a better choice for some of them.
+
+        :param locale: Locale to add
+        """
+
+        self.dict[locale] = {}
+        self._index_locales()
+
+    def _index_locales(self) -> None:
+        """
+        Build the locale tables from the locales of `dict` and forget the
+        locales chosen so far.
+        """
+
+        self._choice_cache.clear()
+        self._by_locale.clear()
+        self._by_lang.clear()
+        self._indexed = list(self.dict)
+
+        for locale in self._indexed:
+            if locale is not None:
+                split = split_locale(locale)
+                self._by_locale.setdefault(split, locale)
+                self._by_lang.setdefault(split[0], locale)
+
     def choose_locale(self, locale: Text) -> Text:
         """
-        Returns the best matching locale in what is available.
+        Returns the best matching locale in what is available. The choice is
+        computed once per locale and then cached, until the locales of `dict`
+        change.
 
         :param locale: Locale to match
         :return: Locale to use
         """
 
-        if locale not in self._choice_cache:
-            locales = self.list_locales()
+        if len(self.dict) != len(self._indexed) or any(
+            a != b for a, b in zip(self.dict, self._indexed)
+        ):
+            self._index_locales()
 
-            best_choice = locales[0]
-            best_level = 0
+        try:
+            return self._choice_cache[locale]
+        except KeyError:
+            pass
 
-            for candidate in locales:
-                cmp = compare_locales(locale, candidate)
+        # The first locale is the default one
+        best_choice = next(iter(self.dict), None)
 
-                if cmp > best_level:
-                    best_choice = candidate
-                    best_level = cmp
+        if locale is None:
+            if None in self.dict:
+                best_choice = None
+        else:
+            split = split_locale(locale)
 
-            self._choice_cache[locale] = best_choice
+            if split in self._by_locale:
+                best_choice = self._by_locale[split]
+            elif split[0] in self._by_lang:
+                best_choice = self._by_lang[split[0]]
 
-        return self._choice_cache[locale]
+        self._choice_cache[locale] = best_choice
+        return best_choice
 
 
 class LocalesFlatDict(LocalesDict):
@@ -107,6 +159,6 @@ class LocalesFlatDict(LocalesDict):
 
         for locale, data in new_data.items():
             if locale not in self.dict:
-                self.dict[locale] = {}
+                self.add_locale(locale)
 
             self.dict[locale].update(data)
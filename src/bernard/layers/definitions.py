@@ -1,3 +1,4 @@
+import sys
 from typing import TYPE_CHECKING, Dict, NamedTuple, Optional
 from typing import Text as TextT
 from typing import Type, TypeVar
@@ -13,6 +14,10 @@ L = TypeVar("L")
 
 
 class BaseLayer(object):
+    # Layers declare the slots of their own attributes, while `__dict__` lets
+    # bots and platforms set other attributes on them like they used to
+    __slots__ = ("__dict__",)
+
     def __eq__(self, other):
         raise NotImplementedError
 
@@ -80,6 +85,8 @@ class Text(BaseLayer):
     The text layer simply represents a text message.
     """
 
+    __slots__ = ("text",)
+
     def __init__(self, text: TransText):
         self.text = text
 
@@ -112,12 +119,16 @@ class MultiText(Text):
     once.
     """
 
+    __slots__ = ()
+
 
 class RawText(BaseLayer):
     """
     That is a text message that warranties it will never have to be translated.
     """
 
+    __slots__ = ("text",)
+
     def __init__(self, text: TextT):
         self.text = text
 
@@ -133,6 +144,8 @@ class Markdown(BaseLayer):
     Like the Text but for Markdown.
     """
 
+    __slots__ = ("text",)
+
     def __init__(self, text: TextT):
         self.text = text
 
@@ -153,6 +166,8 @@ class Sleep(BaseLayer):
     Permit to slow down the debit of the message
     """
 
+    __slots__ = ("duration",)
+
     def __init__(self, duration: float):
         self.duration = duration
 
@@ -169,7 +184,15 @@ class Postback(BaseLayer):
     button. Usually, it's buttons that were previously programmed by the bot.
     """
 
+    __slots__ = ("payload",)
+
     def __init__(self, payload):
+        # Actions are compared to the ones of all the `Action` triggers, which
+        # are interned as well. The payload is copied so that the caller's
+        # dict is left alone.
+        if isinstance(payload, dict) and isinstance(payload.get("action"), str):
+            payload = {**payload, "action": sys.intern(payload["action"])}
+
         self.payload = payload
 
     def __eq__(self, other):
@@ -186,6 +209,8 @@ class BaseMediaLayer(BaseLayer):
     based on what kind of media they have.
     """
 
+    __slots__ = ("media",)
+
     def __init__(self, media):
         self.media = media
 
@@ -201,7 +226,7 @@ class Image(BaseMediaLayer):
     Represents an image
     """
 
-    pass
+    __slots__ = ()
 
 
 class Audio(BaseMediaLayer):
@@ -209,7 +234,7 @@ class Audio(BaseMediaLayer):
     Represents some audio
     """
 
-    pass
+    __slots__ = ()
 
 
 class File(BaseMediaLayer):
@@ -217,7 +242,7 @@ class File(BaseMediaLayer):
     Represents an arbitrary file
     """
 
-    pass
+    __slots__ = ()
 
 
 class Video(BaseMediaLayer):
@@ -225,7 +250,7 @@ class Video(BaseMediaLayer):
     Represents a video
     """
 
-    pass
+    __slots__ = ()
 
 
 class Location(BaseLayer):
@@ -233,6 +258,8 @@ class Location(BaseLayer):
     That's when the user sends his location
     """
 
+    __slots__ = ("point",)
+
     class Point(NamedTuple):
         """
         Representation as tuple of a user location
@@ -256,11 +283,13 @@ class Message(BaseLayer):
     This layer represents a message embedded in another
     """
 
+    __slots__ = ("message", "stack")
+
     def __init__(self, message: "BaseMessage"):
         from bernard.layers import Stack
 
         self.message = message
-        self.stack: Stack = Stack(message.get_layers())
+        self.stack: Stack = message.get_stack()
 
     def _repr_arguments(self):
         return [x for x in self.stack.layers]
@@ -274,6 +303,8 @@ class Typing(BaseLayer):
     Indicates that the bot is currently "typing" its response
     """
 
+    __slots__ = ("active",)
+
     def __init__(self, active=True):
         self.active = active
 
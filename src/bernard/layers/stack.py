@@ -1,6 +1,6 @@
-from typing import TYPE_CHECKING, Dict, List, Text, Type, TypeVar
+from typing import TYPE_CHECKING, Dict, List, Optional, Text, Tuple, Type, TypeVar
 
-from bernard.utils import ClassExp, RoList
+from bernard.utils import ClassExp
 
 from .definitions import BaseLayer
 
@@ -25,10 +25,20 @@ class Stack(object):
     You have helper functions to filter through layer types and so on.
     """
 
+    __slots__ = (
+        "__dict__",
+        "_layers",
+        "_index",
+        "_transformed",
+        "_layers_cache",
+        "annotation",
+    )
+
     def __init__(self, layers: List["BaseLayer"]):
-        self._layers = []
+        self._layers = ()
         self._index = {}
         self._transformed = {}
+        self._layers_cache = {}
         self.layers = layers
         self.annotation = None
 
@@ -40,39 +50,44 @@ class Stack(object):
         return "Stack({})".format(", ".join(repr(x) for x in self._layers))
 
     @property
-    def layers(self) -> List["BaseLayer"]:
+    def layers(self) -> Tuple["BaseLayer", ...]:
         """
-        Return a read-only version of the layers list, so people don't get
-        tempted to append stuff to the list (which would break the index).
+        Return the layers as a tuple, so people don't get tempted to append
+        stuff to the list (which would break the index).
         """
-        # noinspection PyTypeChecker
-        return RoList(self._layers, True)
+        return self._layers
 
     @layers.setter
     def layers(self, value: List["BaseLayer"]):
         """
-        Perform a copy of the layers list in order to avoid the list changing
+        Freeze the layers into a tuple in order to avoid the list changing
         without updating the index.
 
         Then update the index.
         """
-        self._layers = list(value)  # type: List[BaseLayer]
+        self._layers = tuple(value)  # type: Tuple[BaseLayer, ...]
         self._index = self._make_index()
         self._transformed = {}
+        self._layers_cache = {}
 
     def _make_index(self):
         """
         Perform the index computation. It groups layers by type into a
-        dictionary, to allow quick access.
+        dictionary, to allow quick access. Groups are tuples so that they
+        can be handed out without risking a change of the index.
         """
 
         out = {}
 
         for layer in self._layers:
             cls = layer.__class__
-            out[cls] = out.get(cls, []) + [layer]
 
-        return out
+            try:
+                out[cls].append(layer)
+            except KeyError:
+                out[cls] = [layer]
+
+        return {cls: tuple(layers) for cls, layers in out.items()}
 
     async def transform(self, request):
         out = {}
@@ -80,9 +95,14 @@ class Stack(object):
         for layer in self._layers:  # type: BaseLayer
             for become in layer.can_become():
                 b_layer = await layer.become(become, request)
-                out[become] = out.get(become, []) + [b_layer]
 
-        self._transformed = out
+                try:
+                    out[become].append(b_layer)
+                except KeyError:
+                    out[become] = [b_layer]
+
+        self._transformed = {cls: tuple(layers) for cls, layers in out.items()}
+        self._layers_cache = {}
 
     def has_layer(self, class_: Type[L], became: bool = True) -> bool:
         """
@@ -111,21 +131,50 @@ class Stack(object):
             else:
                 raise
 
+    def find_layer(self, class_: Type[L], became: bool = True) -> Optional[L]:
+        """
+        Return the first layer of a given class, or None if that layer is not
+        present. This saves a lookup compared to `has_layer()` followed by
+        `get_layer()`.
+
+        :param class_: class of the expected layer
+        :param became: Allow transformed layers in results
+        """
+
+        layers = self._index.get(class_)
+
+        if layers is None and became:
+            layers = self._transformed.get(class_)
+
+        if layers:
+            return layers[0]
+
     def get_layers(self, class_: Type[L], became: bool = True) -> List[L]:
         """
         Returns the list of layers of a given class. If no layers are present
         then the list will be empty.
 
+        The layers are gathered once and then kept, but each call returns a
+        new list which can be modified freely.
+
         :param class_: class of the expected layers
         :param became: Allow transformed layers in results
         """
 
-        out = self._index.get(class_, [])
+        key = (class_, became)
+
+        try:
+            return list(self._layers_cache[key])
+        except KeyError:
+            pass
+
+        out = self._index.get(class_, ())
 
         if became:
-            out += self._transformed.get(class_, [])
+            out += self._transformed.get(class_, ())
 
-        return out
+        self._layers_cache[key] = out
+        return list(out)
 
     def describe(self) -> Text:
         return ", ".join(s.__class__.__name__ for s in self._layers)
@@ -1,4 +1,4 @@
-from typing import Callable, List, Text, Type, TypeVar
+from typing import Callable, Dict, List, Text, Type, TypeVar
 
 from bernard.conf import settings
 from bernard.core.health_check import HealthCheckFail
@@ -105,6 +105,7 @@ class MiddlewareManager(object):
 
         self._middlewares_classes: List[Text] = settings.MIDDLEWARES
         self.middlewares: List[Type[BaseMiddleware]] = []
+        self._implements: Dict[Text, bool] = {}
 
     @classmethod
     def instance(cls) -> "MiddlewareManager":
@@ -153,6 +154,23 @@ class MiddlewareManager(object):
         """
 
         self.middlewares = [import_class(c) for c in self._middlewares_classes]
+        self._implements.clear()
+
+    def implements(self, name: Text) -> bool:
+        """
+        Tells if any middleware implements the specified function. When none
+        does, callers can skip building the stack entirely.
+
+        :param name: Name of the function to look for
+        """
+
+        try:
+            return self._implements[name]
+        except KeyError:
+            out = self._implements[name] = any(
+                hasattr(m, name) for m in self.middlewares
+            )
+            return out
 
     def get(self, name: Text, final: C) -> C:
         """
@@ -1,7 +1,8 @@
+import sys
 from enum import Enum
 from typing import TYPE_CHECKING, Dict, List, Optional, Text
 
-from bernard.i18n import TransText, render
+from bernard.i18n import TransText, render, render_many
 from bernard.i18n.intents import Intent
 from bernard.layers import BaseLayer
 
@@ -41,6 +42,8 @@ class MessagingType(BaseLayer):
         /send-messages#messaging_types
     """
 
+    __slots__ = ("response", "update", "tag", "subscription", "_args")
+
     def __init__(
         self,
         response: Optional[bool] = None,
@@ -114,11 +117,15 @@ class QuickRepliesList(BaseLayer):
     the user.
     """
 
+    __slots__ = ("options",)
+
     class BaseOption(object):
         """
         Base object for a quick reply option
         """
 
+        __slots__ = ("__dict__",)
+
         type = None
 
     class TextOption(BaseOption):
@@ -127,6 +134,8 @@ class QuickRepliesList(BaseLayer):
         layer).
         """
 
+        __slots__ = ("slug", "text", "intent")
+
         type = "text"
 
         def __init__(
@@ -155,6 +164,8 @@ class QuickRepliesList(BaseLayer):
         layer).
         """
 
+        __slots__ = ()
+
         type = "location"
 
         def __init__(self):
@@ -193,13 +204,17 @@ class QuickRepliesList(BaseLayer):
         matches more or less the content of quick replies.
         """
 
+        options = [
+            o for o in self.options if isinstance(o, QuickRepliesList.TextOption)
+        ]
+        texts = await render_many([o.text for o in options], request)
+
         register["choices"] = {
             o.slug: {
                 "intent": o.intent.key if o.intent else None,
-                "text": await render(o.text, request),
+                "text": text,
             }
-            for o in self.options
-            if isinstance(o, QuickRepliesList.TextOption)
+            for o, text in zip(options, texts)
         }
 
         return register
@@ -210,8 +225,10 @@ class QuickReply(BaseLayer):
     This is what we receive when the user clicks a quick reply.
     """
 
+    __slots__ = ("slug",)
+
     def __init__(self, slug):
-        self.slug = slug
+        self.slug = sys.intern(slug) if isinstance(slug, str) else slug
 
     def __eq__(self, other):
         return self.__class__ == other.__class__ and self.slug == other.slug
@@ -225,6 +242,8 @@ class ButtonTemplate(BaseLayer):
     Represents the Facebook "button template"
     """
 
+    __slots__ = ("text", "buttons", "sharable")
+
     def __init__(
         self, text: TransText, buttons: List[BaseButton], sharable: bool = False
     ):
@@ -255,6 +274,8 @@ class GenericTemplate(BaseLayer):
     Represents the Facebook "generic template"
     """
 
+    __slots__ = ("elements", "aspect_ratio", "sharable")
+
     class AspectRatio(Enum):
         """
         Aspect ratio of card images
@@ -316,6 +337,8 @@ class OptIn(BaseLayer):
     specified user, even if the user did not start a conversation right now.
     """
 
+    __slots__ = ("ref",)
+
     def __init__(self, ref=""):
         self.ref = ref
 
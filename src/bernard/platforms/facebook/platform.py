@@ -267,6 +267,8 @@ class FacebookResponder(Responder):
     Not much to do here
     """
 
+    __slots__ = ()
+
 
 class Facebook(SimplePlatform):
     NAME = "facebook"
@@ -247,6 +247,8 @@ class TelegramResponder(Responder):
     acknowledgements and so on.
     """
 
+    __slots__ = ("_update", "_acq")
+
     def __init__(self, update, platform):
         super(TelegramResponder, self).__init__(platform)
 
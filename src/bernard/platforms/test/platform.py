@@ -76,6 +76,8 @@ class TestResponder(Responder):
     It's just a proxy to the platform's `send()` method.
     """
 
+    __slots__ = ()
+
 
 class TestPlatform(Platform):
     """
@@ -69,7 +69,13 @@ class Trigram(object):
         self._string = string
         self._norm = normalize(string)
         self._words = make_words(self._norm)
-        self._trigrams = set(t for w in self._words for t in make_trigrams(w))
+
+        # Trigrams are packed into 3-character strings, which are compared
+        # faster than tuples when intersecting sets.
+        self._trigrams = frozenset(
+            "".join(t) for w in self._words for t in make_trigrams(w)
+        )
+        self._size = len(self._trigrams)
 
     def __repr__(self):
         return f"Trigram({repr(self._norm)})"
@@ -78,14 +84,12 @@ class Trigram(object):
         """
         Compute the similarity with the provided other trigram.
         """
-        if not len(self._trigrams) or not len(other._trigrams):
+        if not self._size or not other._size:
             return 0
 
-        count = float(len(self._trigrams & other._trigrams))
-        len1 = float(len(self._trigrams))
-        len2 = float(len(other._trigrams))
+        count = len(self._trigrams & other._trigrams)
 
-        return count / (len1 + len2 - count)
+        return count / (self._size + other._size - count)
 
     def __mod__(self, other: "Trigram") -> float:
         """
@@ -102,25 +106,61 @@ class Matcher(object):
     def __init__(self, trigrams: List[Union[Trigram, Tuple[Trigram, ...]]]):
         self.trigrams = [(t,) if isinstance(t, Trigram) else t for t in trigrams]
 
+        # Most strings don't have negative trigrams. The sets and sizes of
+        # those are kept aside so they can be compared in a tight loop.
+        self._simple = [
+            (t[0]._trigrams, t[0]._size) for t in self.trigrams if len(t) == 1
+        ]
+        self._negated = [t for t in self.trigrams if len(t) > 1]
+
     def _match(self, local: Tuple[Trigram, ...], other: Trigram) -> float:
         """
         Match a trigram with another one. If the negative matching wins,
         returns an inverted matching.
         """
 
-        pos = local[0] % other
-        neg = max((x % other for x in local[1:]), default=0)
+        pos = local[0].similarity(other)
 
-        if neg > pos:
-            return 0.0
+        for x in local[1:]:
+            if x.similarity(other) > pos:
+                return 0.0
 
         return pos
 
     def similarity(self, other: Trigram) -> float:
         """
-        Find the best similarity within known trigrams.
+        Find the best similarity within known trigrams. Nothing can beat an
+        exact match, so the search stops there.
         """
-        return max((self._match(x, other) for x in self.trigrams), default=0)
+
+        best = 0
+        trigrams = other._trigrams
+        size = other._size
+
+        if not size:
+            return best
+
+        for local, local_size in self._simple:
+            if local_size:
+                count = len(local & trigrams)
+                score = count / (local_size + size - count)
+
+                if score > best:
+                    best = score
+
+                    if best >= 1.0:
+                        return best
+
+        for x in self._negated:
+            score = self._match(x, other)
+
+            if score > best:
+                best = score
+
+                if best >= 1.0:
+                    break
+
+        return best
 
     def __mod__(self, other) -> float:
         """
@@ -146,7 +186,15 @@ class LabelMatcher(object):
         Returns the best matching score and the associated label.
         """
 
-        return max(
-            ((t % other, l) for t, l in self.trigrams),
-            key=lambda x: x[0],
-        )
+        if not self.trigrams:
+            raise ValueError("No trigram to match against")
+
+        best_score, best_label = None, None
+
+        for t, label in self.trigrams:
+            score = t.similarity(other)
+
+            if best_score is None or score > best_score:
+                best_score, best_label = score, label
+
+        return best_score, best_label
@@ -2,6 +2,7 @@ import asyncio
 import importlib
 import re
 from asyncio import iscoroutine
+from functools import lru_cache
 from itertools import chain
 from typing import (
     Any,
@@ -19,9 +20,11 @@ from typing import (
 from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
 
 
+@lru_cache(maxsize=512)
 def import_class(name: Text) -> Type:
     """
-    Import a class based on its full name.
+    Import a class based on its full name. Successful imports are cached, so
+    resolving the same name again is a dictionary lookup.
 
     :param name: name of the class
     """
@@ -123,9 +126,9 @@ def make_ro(obj: Any, forgive_type=False):
 
     if isinstance(obj, (str, bytes, int, float, bool, RoDict, RoList)) or obj is None:
         return obj
-    elif isinstance(obj, Mapping):
+    elif type(obj) is dict or isinstance(obj, Mapping):
         return RoDict(obj, forgive_type)
-    elif isinstance(obj, Sequence):
+    elif type(obj) is list or isinstance(obj, Sequence):
         return RoList(obj, forgive_type)
     elif forgive_type:
         return obj
@@ -1,4 +1,6 @@
+import asyncio
 import os
+import threading
 from unittest.mock import Mock
 
 import pytest
@@ -7,7 +9,7 @@ from bernard import layers as l
 from bernard.conf.utils import patch_conf
 from bernard.engine import triggers as trig
 from bernard.engine.fsm import FSM
-from bernard.engine.platform import Platform
+from bernard.engine.platform import Platform, SimplePlatform
 from bernard.engine.request import BaseMessage, Conversation, Request, User
 from bernard.engine.responder import Responder
 from bernard.engine.transition import Transition
@@ -16,7 +18,7 @@ from bernard.i18n import translate as t
 from bernard.layers.stack import stack
 from bernard.platforms.facebook import layers as fbl
 from bernard.platforms.test.platform import make_test_fsm
-from bernard.storage.register import RedisRegisterStore, Register
+from bernard.storage.register import BaseRegisterStore, RedisRegisterStore, Register
 from bernard.utils import run
 
 from .states import BaseTestState, Great, Hello, HowAreYou
@@ -55,6 +57,20 @@ ENGINE_SETTINGS_FILE = os.path.join(
 )
 
 
+# noinspection PyProtectedMember
+def make_fsm(transitions):
+    """
+    Creates a FSM using these transitions instead of the ones from the
+    settings, with its indexes built again from them.
+    """
+
+    fsm = FSM()
+    fsm.transitions = transitions
+    fsm._candidates = fsm._make_candidates()
+    fsm._jumping_bounds = fsm._make_jumping_bounds()
+    return fsm
+
+
 @pytest.fixture(scope="module")
 def reg():
     return Register(
@@ -152,6 +168,32 @@ def test_request_stack(reg):
     assert len(req.get_layers(l.Text)) == 1
 
 
+# noinspection PyShadowingNames
+def test_request_locale_override(reg):
+    req = MockRequest(MockTextMessage("foo"), reg)
+    run(req.transform())
+    assert req.locale_override is None
+
+    req.set_locale_override("fr")
+    assert req.locale_override == "fr"
+
+
+# noinspection PyShadowingNames
+def test_request_sign_url(reg):
+    class TokenMessage(MockTextMessage):
+        async def get_token(self):
+            return "tok"
+
+    req = MockRequest(TokenMessage("foo"), reg)
+    url = "https://example.com/?a=1"
+
+    assert run(req.sign_url(url)) == "https://example.com/?a=1#tok"
+    assert run(req.sign_url(url, Request.QUERY)).startswith("https://example.com/?a=1&")
+
+    with pytest.raises(ValueError):
+        run(req.sign_url(url, "foo"))
+
+
 # noinspection PyShadowingNames
 def test_anything_trigger(text_request):
     with patch_conf(LOADER_CONFIG):
@@ -189,6 +231,12 @@ def test_choice_trigger(reg):
         assert run(ct.rank()) == 1.0
         assert ct.slug == "bar"
 
+        # A reused trigger forgets the choice it found the previous time
+        req.register = Register({})
+        assert not run(ct.rank())
+        assert ct.slug is None
+        assert ct.chosen is None
+
 
 def test_fsm_init():
     with patch_conf(settings_file=ENGINE_SETTINGS_FILE):
@@ -240,6 +288,241 @@ def test_fsm_find_trigger(reg):
         assert state == Great
 
 
+class RecordingTrigger(trig.BaseTrigger):
+    ranked = []
+
+    def rank(self):
+        self.ranked.append(self)
+        return 1.0
+
+
+# noinspection PyShadowingNames,PyProtectedMember
+def test_fsm_skip_jumping_transitions(reg):
+    with patch_conf(settings_file=ENGINE_SETTINGS_FILE):
+        fsm = make_fsm(
+            [
+                Transition(dest=Hello, factory=RecordingTrigger.builder()),
+                Transition(
+                    dest=Great,
+                    origin=HowAreYou,
+                    factory=trig.Anything.builder(),
+                ),
+            ]
+        )
+        req = MockRequest(MockTextMessage("hello"), reg)
+        run(req.transform())
+
+        RecordingTrigger.ranked = []
+        _, state, _ = run(fsm._find_trigger(req, HowAreYou.name()))
+        assert state == Great
+        assert RecordingTrigger.ranked == []
+
+        fsm.transitions[1].weight = 0.5
+        _, state, _ = run(fsm._find_trigger(req, HowAreYou.name()))
+        assert state == Hello
+        assert len(RecordingTrigger.ranked) == 1
+
+
+# noinspection PyShadowingNames,PyProtectedMember
+def test_fsm_rank_shared_factory_once(reg):
+    with patch_conf(settings_file=ENGINE_SETTINGS_FILE):
+        factory = RecordingTrigger.builder()
+        fsm = make_fsm(
+            [
+                Transition(dest=Hello, factory=factory, weight=0.5),
+                Transition(dest=Great, factory=factory),
+            ]
+        )
+        req = MockRequest(MockTextMessage("hello"), reg)
+        run(req.transform())
+
+        RecordingTrigger.ranked = []
+        _, state, _ = run(fsm._find_trigger(req))
+        assert state == Great
+        assert len(RecordingTrigger.ranked) == 1
+
+
+class SlowTrigger(trig.BaseTrigger):
+    cancelled = False
+
+    async def rank(self):
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            SlowTrigger.cancelled = True
+            raise
+
+
+# noinspection PyShadowingNames,PyProtectedMember
+def test_fsm_cancel_beaten_ranks(reg):
+    with patch_conf(settings_file=ENGINE_SETTINGS_FILE):
+        fsm = make_fsm(
+            [
+                Transition(dest=Hello, factory=SlowTrigger.builder(), weight=0.5),
+                Transition(dest=Great, factory=trig.Anything.builder()),
+            ]
+        )
+        req = MockRequest(MockTextMessage("hello"), reg)
+        run(req.transform())
+
+        async def find():
+            out = await fsm._find_trigger(req)
+            await asyncio.sleep(0)
+            return out
+
+        _, state, _ = run(find())
+        assert state == Great
+        assert SlowTrigger.cancelled
+
+
+class ThreadTrigger(trig.BaseTrigger):
+    cpu_bound = True
+    thread = None
+
+    def rank(self):
+        ThreadTrigger.thread = threading.get_ident()
+        return 1.0
+
+
+# noinspection PyShadowingNames
+def test_transition_cpu_bound(reg):
+    with patch_conf(settings_file=ENGINE_SETTINGS_FILE):
+        t = Transition(dest=Hello, factory=ThreadTrigger.builder())
+        req = MockRequest(MockTextMessage("hello"), reg)
+        score, trigger, state, _ = run(t.rank(req, None))
+
+        assert score == 1.0
+        assert isinstance(trigger, ThreadTrigger)
+        assert state == Hello
+        assert ThreadTrigger.thread != threading.get_ident()
+
+
+class CountingTrigger(trig.BaseTrigger):
+    running = 0
+    max_running = 0
+
+    async def rank(self):
+        CountingTrigger.running += 1
+        CountingTrigger.max_running = max(
+            CountingTrigger.max_running, CountingTrigger.running
+        )
+        await asyncio.sleep(0)
+        CountingTrigger.running -= 1
+        return 0.5
+
+
+# noinspection PyShadowingNames,PyProtectedMember
+def test_fsm_max_concurrent_triggers(reg):
+    with patch_conf({"MAX_CONCURRENT_TRIGGERS": 2}, ENGINE_SETTINGS_FILE):
+        fsm = make_fsm(
+            [
+                Transition(dest=Hello, factory=CountingTrigger.builder())
+                for _ in range(5)
+            ]
+        )
+        req = MockRequest(MockTextMessage("hello"), reg)
+        run(req.transform())
+
+        _, state, _ = run(fsm._find_trigger(req))
+        assert state == Hello
+        assert CountingTrigger.max_running == 2
+
+
+class NoTrigger(trig.BaseTrigger):
+    async def rank(self):
+        await asyncio.sleep(0)
+        return 0.0
+
+
+# noinspection PyShadowingNames
+def test_worst_trigger(text_request):
+    SlowTrigger.cancelled = False
+    wt = trig.Worst(text_request, [trig.Anything.builder(), NoTrigger.builder()])
+    assert run(wt.rank()) == 0.0
+
+    async def rank_concurrently():
+        wt = trig.Worst(
+            text_request,
+            [trig.Anything.builder(), SlowTrigger.builder(), NoTrigger.builder()],
+            max_concurrency=None,
+        )
+        out = await wt.rank()
+        await asyncio.sleep(0)
+        return out
+
+    assert run(rank_concurrently()) == 0.0
+    assert SlowTrigger.cancelled
+
+    factories = [
+        ApiTrigger.builder(),
+        trig.Text.builder(intents.HELLO),
+        NoTrigger.builder(),
+        trig.Layer.builder(l.RawText),
+    ]
+
+    wt = trig.Worst(text_request, factories)
+    assert wt.triggers == factories
+
+    wt = trig.Worst(text_request, factories, sort_by_cost=True)
+    assert [f.trigger_name for f in wt.triggers] == [
+        "Layer",
+        "Text",
+        "NoTrigger",
+        "ApiTrigger",
+    ]
+
+
+# noinspection PyShadowingNames
+def test_worst_trigger_sub_triggers(text_request):
+    factory = ThreadTrigger.builder()
+
+    for max_concurrency in [1, None]:
+        ThreadTrigger.thread = None
+        text_request._triggers.clear()
+        wt = trig.Worst(text_request, [factory], max_concurrency=max_concurrency)
+
+        assert run(wt.rank()) == 1.0
+        assert ThreadTrigger.thread != threading.get_ident()
+        assert isinstance(text_request._triggers[factory], ThreadTrigger)
+
+
+class ApiTrigger(trig.SharedTrigger):
+    calls = 0
+
+    @classmethod
+    def cache_key(cls) -> str:
+        return "api"
+
+    async def call_api(self):
+        ApiTrigger.calls += 1
+        await asyncio.sleep(0)
+        return {"hello": 1.0, "bye": 0.5}
+
+    async def compute_rank(self, value):
+        return value[self.key]
+
+
+class HelloApiTrigger(ApiTrigger):
+    key = "hello"
+
+
+class ByeApiTrigger(ApiTrigger):
+    key = "bye"
+
+
+# noinspection PyShadowingNames
+def test_shared_trigger(text_request):
+    async def rank():
+        return await asyncio.gather(
+            HelloApiTrigger(text_request).rank(),
+            ByeApiTrigger(text_request).rank(),
+        )
+
+    assert run(rank()) == [1.0, 0.5]
+    assert ApiTrigger.calls == 1
+    assert HelloApiTrigger(text_request).lock is ByeApiTrigger(text_request).lock
+
+
 # noinspection PyShadowingNames,PyProtectedMember
 def test_fsm_confused_state():
     with patch_conf(settings_file=ENGINE_SETTINGS_FILE):
@@ -250,6 +533,7 @@ def test_fsm_confused_state():
         req = Request(MockEmptyMessage(), reg)
         run(req.transform())
         assert fsm._confused_state(req) == BaseTestState
+        assert fsm._default_state == BaseTestState
 
         reg = Register({Register.STATE: "tests.issue_0001.states.Hello"})
         req = Request(MockEmptyMessage(), reg)
@@ -257,6 +541,172 @@ def test_fsm_confused_state():
         assert fsm._confused_state(req) == Hello
 
 
+class MockRawTextMessage(BaseMockMessage):
+    def __init__(self, text):
+        self.text = text
+
+    def get_layers(self):
+        return [l.RawText(self.text)]
+
+
+def test_message_with_layers():
+    message = MockRawTextMessage("hi")
+    assert message.get_stack().layers == (l.RawText("hi"),)
+
+    other = message.with_layers([l.RawText("hello")])
+    assert other.get_layers() == [l.RawText("hello")]
+    assert other.get_stack().layers == (l.RawText("hello"),)
+    assert other.get_conversation().id == message.get_conversation().id
+
+    assert message.get_layers() == [l.RawText("hi")]
+    assert message.get_stack().layers == (l.RawText("hi"),)
+
+
+class MemoryRegisterStore(BaseRegisterStore):
+    def __init__(self):
+        self.data = {}
+        self.writes = 0
+
+    async def _start(self, key):
+        pass
+
+    async def _get(self, key):
+        return self.data.get(key, {})
+
+    async def _replace(self, key, data):
+        self.data[key] = data
+        self.writes += 1
+
+    async def _finish(self, key):
+        pass
+
+
+# noinspection PyProtectedMember
+def test_fsm_queue_coalesce_register():
+    with patch_conf({"MAX_QUEUED_BURST": 10}, ENGINE_SETTINGS_FILE):
+        fsm = FSM()
+        fsm.register = MemoryRegisterStore()
+
+        async def handle_in_register(message, responder, reg):
+            reg.replacement = {"count": reg.get("count", 0) + 1}
+            return reg.replacement
+
+        fsm._handle_in_register = handle_in_register
+
+        async def test():
+            for text in ["hello", "how", "are", "you"]:
+                fsm.handle_message(MockTextMessage(text), None, True)
+
+            while fsm._queues:
+                await asyncio.sleep(0)
+
+        run(test())
+
+        assert fsm.register.data == {"fake_convo": {"count": 4}}
+        assert fsm.register.writes == 1
+
+
+# noinspection PyProtectedMember
+@pytest.mark.parametrize("conf,writes", [({}, 6), ({"MAX_QUEUED_BURST": 3}, 2)])
+def test_fsm_queue_burst_size(conf, writes):
+    with patch_conf(conf, ENGINE_SETTINGS_FILE):
+        fsm = FSM()
+        fsm.register = MemoryRegisterStore()
+
+        async def handle_in_register(message, responder, reg):
+            reg.replacement = {"count": reg.get("count", 0) + 1}
+            return reg.replacement
+
+        fsm._handle_in_register = handle_in_register
+
+        async def test():
+            for text in ["hello", "how", "are", "you", "doing", "today"]:
+                fsm.handle_message(MockTextMessage(text), None, True)
+
+            while fsm._queues:
+                await asyncio.sleep(0)
+
+        run(test())
+
+        assert fsm.register.data == {"fake_convo": {"count": 6}}
+        assert fsm.register.writes == writes
+
+
+# noinspection PyProtectedMember
+def test_fsm_queue_merge():
+    class FlushedResponder(Responder):
+        flushed = []
+
+        async def flush(self, request):
+            self.flushed.append(request.message.get_stack())
+
+    with patch_conf({"MERGE_QUEUED_TEXTS": True}, ENGINE_SETTINGS_FILE):
+        fsm = FSM()
+        fsm.register = MemoryRegisterStore()
+        handled = []
+
+        async def handle_in_register(message, responder, reg):
+            handled.append(message.get_stack())
+
+        fsm._handle_in_register = handle_in_register
+
+        async def test():
+            for message in [
+                MockRawTextMessage("hi"),
+                MockRawTextMessage("you there?"),
+                MockEmptyMessage(),
+                MockRawTextMessage("help"),
+            ]:
+                fsm.handle_message(message, FlushedResponder(Platform()), True)
+
+            while fsm._queues:
+                await asyncio.sleep(0)
+
+        run(test())
+
+        assert handled == [
+            stack(l.RawText("hi\nyou there?")),
+            stack(),
+            stack(l.RawText("help")),
+        ]
+        assert FlushedResponder.flushed == [stack(l.RawText("hi"))]
+
+
+# noinspection PyProtectedMember
+def test_fsm_queue_error():
+    with patch_conf(settings_file=ENGINE_SETTINGS_FILE):
+        fsm = FSM()
+        fsm.register = MemoryRegisterStore()
+        handled = []
+        errors = []
+
+        async def handle_in_register(message, responder, reg):
+            if not message.get_stack().layers:
+                raise ValueError
+
+            handled.append(message.get_stack())
+
+        fsm._handle_in_register = handle_in_register
+
+        async def test():
+            loop = asyncio.get_event_loop()
+            loop.set_exception_handler(lambda _, context: errors.append(context))
+
+            try:
+                fsm.handle_message(MockEmptyMessage(), None, True)
+                fsm.handle_message(MockRawTextMessage("hi"), None, True)
+
+                while fsm._queues:
+                    await asyncio.sleep(0)
+            finally:
+                loop.set_exception_handler(None)
+
+        run(test())
+
+        assert handled == [stack(l.RawText("hi"))]
+        assert [type(e["exception"]) for e in errors] == [ValueError]
+
+
 # noinspection PyProtectedMember
 def test_platform_event():
     platform = Platform()
@@ -270,6 +720,57 @@ def test_platform_event():
     mock_cb.assert_called_once_with(data, responder, True)
 
 
+def test_responder_send_batch():
+    class BatchPlatform(Platform):
+        def __init__(self):
+            super().__init__()
+            self.batches = []
+
+        def accept(self, stack):
+            return True
+
+        def accept_batch(self):
+            return True
+
+        async def send_batch(self, request, stacks):
+            self.batches.append(list(stacks))
+
+    platform = BatchPlatform()
+    responder = Responder(platform)
+    responder.send([l.Text("foo")])
+    responder.send([l.Text("bar")])
+    run(responder.flush(None))
+
+    assert platform.batches == [[stack(l.Text("foo")), stack(l.Text("bar"))]]
+
+
+class MockSimplePlatform(SimplePlatform):
+    PATTERNS = {
+        "text": "^Text+$",
+        "sleep": "^Sleep$",
+    }
+
+    async def _send_text(self, request, stack):
+        return "text"
+
+    async def _send_sleep(self, request, stack):
+        return "sleep"
+
+
+def test_simple_platform_send_table():
+    platform = MockSimplePlatform()
+
+    assert set(MockSimplePlatform._SEND_TABLE) == {"text", "sleep"}
+    assert run(platform.send(None, stack(l.Text("foo")))) == "text"
+    assert run(platform.send(None, stack(l.Sleep(1.0)))) == "sleep"
+
+    async def send_text(request, stack):
+        return "patched"
+
+    platform._send_text = send_text
+    assert run(platform.send(None, stack(l.Text("foo")))) == "patched"
+
+
 def test_story_hello():
     with patch_conf(settings_file=ENGINE_SETTINGS_FILE):
         _, platform = make_test_fsm()
@@ -1,3 +1,4 @@
+import asyncio
 import datetime
 import os
 from unittest.mock import Mock
@@ -9,15 +10,17 @@ from dateutil import tz
 from bernard.conf.utils import patch_conf
 
 # noinspection PyProtectedMember
-from bernard.i18n._formatter import make_date
+from bernard.i18n._formatter import make_date, make_datetime
 from bernard.i18n.intents import Intent, IntentsDb, IntentsMaker
 from bernard.i18n.loaders import (
     BaseIntentsLoader,
     BaseTranslationLoader,
     CsvIntentsLoader,
     CsvTranslationLoader,
+    _parse_csv,
 )
 from bernard.i18n.translator import *
+from bernard.trigram import Trigram
 from bernard.utils import run
 
 TRANS_FILE_PATH = os.path.join(
@@ -106,6 +109,21 @@ def test_load_translations_csv():
     mock_cb.assert_called_once_with({None: list(data.items())}, {})
 
 
+def test_load_translations_csv_flags(tmp_path):
+    path = tmp_path / "trans.csv"
+    path.write_text("FOO,foo, foo 2\n\nBAR,bar\nBAZ,,baz 2\n")
+
+    mock_cb = Mock()
+    loader = CsvTranslationLoader()
+    loader.on_update(mock_cb)
+    run(loader.load(file_path=str(path), flags={1: {}, 2: {"v": "2"}}))
+
+    assert mock_cb.call_args_list == [
+        (({None: [("FOO", "foo"), ("BAR", "bar")]}, {}),),
+        (({None: [("FOO", "foo 2"), ("BAZ", "baz 2")]}, {"v": "2"}),),
+    ]
+
+
 def test_base_translations_loader_is_abstract():
     loader = BaseTranslationLoader()
     with pytest.raises(NotImplementedError):
@@ -138,6 +156,139 @@ def test_load_intents_csv():
     mock_cb.assert_called_once_with({None: data})
 
 
+# noinspection PyProtectedMember
+def test_parse_csv():
+    plain = "FOO,bar, baz\r\n\nBAR,ᕕ( ՞ ᗜ ՞ )ᕗ\r\n".encode()
+    assert list(_parse_csv(plain)) == [["FOO", "bar", " baz"], ["BAR", "ᕕ( ՞ ᗜ ՞ )ᕗ"]]
+
+    quoted = b'FOO,"bar, baz"\nBAR,"foo\nbar"\n'
+    assert list(_parse_csv(quoted)) == [["FOO", "bar, baz"], ["BAR", "foo\nbar"]]
+
+    separator = "FOO,bar\u2028baz\r\nBAR,foo\rBAZ,\r\n".encode()
+    assert list(_parse_csv(separator)) == [
+        ["FOO", "bar\u2028baz"],
+        ["BAR", "foo"],
+        ["BAZ", ""],
+    ]
+
+
+# noinspection PyProtectedMember
+def test_live_loader_has_changed(tmp_path):
+    path = tmp_path / "trans.csv"
+    path.write_text("FOO,bar\n")
+
+    loader = CsvTranslationLoader()
+    loader._file_path = str(path)
+
+    assert loader._has_changed()
+    assert loader._read() == b"FOO,bar\n"
+    assert not loader._has_changed()
+
+    os.utime(path, ns=(0, 0))
+    assert not loader._has_changed()
+
+    path.write_text("FOO,baz\n")
+    assert loader._has_changed()
+
+    st = path.stat()
+    path.write_text("FOO,bar\n")
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert not loader._has_changed()
+    assert loader._has_changed(notified=True)
+    assert not loader._has_changed(notified=True)
+
+    path.unlink()
+    assert not loader._has_changed()
+
+
+# noinspection PyProtectedMember
+def test_live_loader_follows_replaced_file(tmp_path, monkeypatch):
+    aionotify = pytest.importorskip("aionotify")
+    from bernard.i18n import loaders
+
+    monkeypatch.setattr(loaders, "aionotify", aionotify, raising=False)
+    monkeypatch.setattr(loaders, "settings", Mock(I18N_LIVE_RELOAD=True))
+
+    path = tmp_path / "trans.csv"
+    path.write_text("FOO,bar\n")
+
+    async def scenario():
+        received = asyncio.Queue()
+
+        async def reloaded():
+            return await asyncio.wait_for(received.get(), 5)
+
+        loader = CsvTranslationLoader()
+        loader.on_update(lambda data, flags: received.put_nowait(data[None]))
+        await loader.load(file_path=str(path))
+        assert await reloaded() == [("FOO", "bar")]
+
+        # Unrelated files in the same directory are not watched, otherwise
+        # the next reload would not be the one of the in-place save
+        (tmp_path / "other.csv").write_text("FOO,other\n")
+
+        # In-place save
+        path.write_text("FOO,baz\n")
+        assert await reloaded() == [("FOO", "baz")]
+
+        # Atomic replace, like most editors do
+        new_path = tmp_path / "trans.csv.new"
+        new_path.write_text("FOO,qux\n")
+        os.replace(new_path, path)
+        assert await reloaded() == [("FOO", "qux")]
+
+        # The new file is watched as well
+        path.write_text("FOO,quux\n")
+        assert await reloaded() == [("FOO", "quux")]
+
+        # A burst of saves only triggers one reload, with the last content.
+        # The watcher gets to see each save, well within the debounce delay.
+        monkeypatch.setattr(CsvTranslationLoader, "DEBOUNCE_DELAY", 0.5)
+
+        for value in ("a", "b", "c"):
+            path.write_text(f"FOO,{value}\n")
+            await asyncio.sleep(0.01)
+
+        assert await reloaded() == [("FOO", "c")]
+
+        loader._running = False
+        loader._watcher.close()
+
+    run(scenario())
+
+
+def test_loaders_share_parsed_content(tmp_path, monkeypatch):
+    parse = CsvIntentsLoader._parse
+    calls = []
+
+    def counting_parse(self, content):
+        calls.append(content)
+        return parse(self, content)
+
+    monkeypatch.setattr(CsvIntentsLoader, "_parse", counting_parse)
+    CsvIntentsLoader.clear_cache()
+
+    for name in ("a.csv", "b.csv"):
+        (tmp_path / name).write_text("FOO,foo\nBAR,bar\n")
+
+    mock_cb = Mock()
+
+    for name in ("a.csv", "b.csv"):
+        loader = CsvIntentsLoader()
+        loader.on_update(mock_cb)
+        run(loader.load(file_path=str(tmp_path / name)))
+
+    loader = CsvIntentsLoader()
+    loader.on_update(mock_cb)
+    run(loader.load(file_path=str(tmp_path / "a.csv"), locale="fr"))
+
+    assert len(calls) == 2
+    assert mock_cb.call_args_list[0] == mock_cb.call_args_list[1]
+    assert mock_cb.call_args_list[2] == (
+        ({"fr": {"FOO": [("foo",)], "BAR": [("bar",)]}},),
+    )
+
+
 def test_word_dict_count():
     wd = WordDictionary()
 
@@ -196,6 +347,53 @@ def test_translate_render():
         assert run(t.FOO.render()) == "éléphant"
 
 
+def test_translate_render_params():
+    with patch_conf(LOADER_CONFIG):
+        wd = WordDictionary()
+        wd.update({None: [("GREET", "{a} / {b} / {c}")]}, {})
+        t = Translator(wd)
+
+        assert run(t("GREET", a=t.FOO, b=t.BAR, c=42).render()) == (
+            "éléphant / baz / 42"
+        )
+        assert run(t("GREET", a=t.FOO, b="bar", c=42).render()) == (
+            "éléphant / bar / 42"
+        )
+
+
+def test_render_many():
+    calls = []
+
+    async def get_locale():
+        calls.append("locale")
+        return None
+
+    async def get_timezone():
+        return None
+
+    async def get_trans_flags():
+        return {}
+
+    request = Mock()
+    request.get_locale = get_locale
+    request.get_trans_flags = get_trans_flags
+    request.user.get_timezone = get_timezone
+
+    with patch_conf(LOADER_CONFIG):
+        wd = WordDictionary()
+        t = Translator(wd)
+
+        assert run(render_many([t.FOO, "bar", t.FOO], request)) == [
+            "éléphant",
+            "bar",
+            "éléphant",
+        ]
+        assert calls == ["locale"]
+
+        with pytest.raises(TypeError):
+            run(render_many([42], None))
+
+
 def test_translate_singleton():
     from bernard.i18n import translate as t
 
@@ -220,6 +418,25 @@ def test_serialize():
             "params": {},
         }
 
+        assert type(serialize(s)["params"]) is dict
+
+
+# noinspection PyProtectedMember
+def test_translator_fresh_strings():
+    with patch_conf(LOADER_CONFIG):
+        t = Translator(WordDictionary())
+
+        assert t.FOO is not t.FOO
+        assert t("FOO") is not t("FOO")
+        assert t.FOO.params == {}
+
+        foo = t.FOO
+        foo.params["bar"] = "baz"
+        assert t.FOO.params == {}
+
+        t._regenerate_word_dict()
+        assert t.FOO.wd is t.wd
+
 
 def test_unserialize():
     with patch_conf(LOADER_CONFIG):
@@ -267,6 +484,15 @@ def test_intents_db():
         assert db.get("FOO", None) == [("bar",), ("baz",)]
 
 
+def test_intents_db_new_locale():
+    with patch_conf(LOADER_CONFIG_3):
+        db = IntentsDb()
+        assert db.get("FOO", "en") == [("bar",), ("baz",)]
+
+        db.update({"en": {"FOO": [("qux",)]}})
+        assert db.get("FOO", "en") == [("qux",)]
+
+
 def test_intent():
     with patch_conf(LOADER_CONFIG_3):
         db = IntentsDb()
@@ -274,11 +500,31 @@ def test_intent():
         assert run(intent.strings()) == [("bar",), ("baz",)]
 
 
+def test_intent_matcher():
+    with patch_conf(LOADER_CONFIG_3):
+        db = IntentsDb()
+        intent = Intent(db, "FOO")
+        matcher = run(intent.matcher())
+
+        assert matcher % Trigram("baz") == 1.0
+        assert run(intent.matcher()) is matcher
+
+        db.update({None: {"FOO": [("qux",)]}})
+        assert run(intent.matcher()) % Trigram("qux") == 1.0
+
+        db.dict[None]["FOO"] = [("quux",)]
+        assert run(intent.matcher()) % Trigram("quux") == 1.0
+
+        db.dict[None]["BAR"] = [("bar",)]
+        assert run(Intent(db, "BAR").matcher()) % Trigram("bar") == 1.0
+
+
 def test_intents_maker():
     with patch_conf(LOADER_CONFIG_3):
         db = IntentsDb()
         maker = IntentsMaker(db)
         assert run(maker.FOO.strings()) == [("bar",), ("baz",)]
+        assert maker.FOO is maker.FOO
 
 
 def test_intents_maker_singleton():
@@ -310,6 +556,16 @@ def test_make_date():
     assert make_date(d3, test_tz) != d
 
 
+def test_make_datetime():
+    d = datetime.datetime(2000, 1, 1, 0, 0, tzinfo=datetime.timezone.utc)
+    assert make_datetime(d) == d
+    assert make_datetime("2000-01-01T00:00:00.000000Z") == d.date()
+    assert type(make_datetime("2000-01-01T12:00:00")) is datetime.date
+
+    test_tz = tz.tzoffset("IST", -3600)
+    assert make_datetime(d, test_tz).hour == 23
+
+
 def test_format_date():
     test_tz = tz.tzoffset("IST", -3600)
     f = I18nFormatter("fr", test_tz)
@@ -320,3 +576,102 @@ def test_format_date():
         f.format("Posté le {post_date:date:medium}", post_date=d)
         == "Posté le 1 janv. 2000"
     )
+
+    assert (
+        f.format("Posté le {post_date:date:d MMMM}", post_date=d)
+        == "Posté le 1 janvier"
+    )
+
+    f = I18nFormatter("en")
+    assert f.format("{count:number} views", count=1234.5) == "1,234.5 views"
+
+
+# noinspection PyProtectedMember
+def test_format_compiled_template():
+    from bernard.i18n.translator import _compile_template, _format_template
+
+    f = I18nFormatter("en")
+    params = {"name": "Rémy", "count": 1234.5, "user": {"name": "Rémy"}}
+
+    for template in [
+        "No field at all",
+        "Escaped {{braces}}",
+        "{name}",
+        "Hello {name!r}, {count:number} views",
+        "{count:>10}|",
+        "Nested {count:{name}}",
+        "Item {user[name]}",
+        "Attr {count.real:number}",
+        "Positional {0}",
+    ]:
+        try:
+            expected = f.format(template, **params)
+        except (KeyError, IndexError, ValueError) as e:
+            expected = e.__class__
+
+        try:
+            actual = _format_template(f, template, params)
+        except (KeyError, IndexError, ValueError) as e:
+            actual = e.__class__
+
+        assert actual == expected
+
+    assert _compile_template("No field at all") == "No field at all"
+    assert _compile_template("Item {user[name]}") == (
+        ("Item ", "user", ((False, "name"),), "", None),
+    )
+    assert _compile_template("Positional {0}") is None
+
+    with pytest.raises(KeyError):
+        _format_template(f, "Hello {missing}", params)
+
+
+# noinspection PyProtectedMember
+def test_get_formatter():
+    from bernard.i18n.translator import _get_formatter
+
+    paris = tz.gettz("Europe/Paris")
+    f = _get_formatter("fr", paris)
+
+    assert f.lang == "fr"
+    assert f.timezone is paris
+    assert _get_formatter("fr", paris) is f
+    assert _get_formatter("fr", tz.tzoffset("ITC", 3600.0)) is not f
+    assert _get_formatter("en", paris) is not f
+
+
+def test_choose_locale():
+    from bernard.i18n.utils import LocalesDict, compare_locales
+
+    def brute_force(d, locale):
+        locales = d.list_locales()
+        best, level = locales[0], 0
+
+        for candidate in locales:
+            if compare_locales(locale, candidate) > level:
+                best, level = candidate, compare_locales(locale, candidate)
+
+        return best
+
+    requested = [None, "fr", "fr_FR", "fr-be", "EN_gb", "en", "de_DE", ""]
+
+    for available in [[], ["fr"], [None, "en_US"], ["fr_CA", "en", "fr_FR", "en_GB"]]:
+        d = LocalesDict()
+
+        for locale in available:
+            d.add_locale(locale)
+
+        for locale in requested:
+            assert d.choose_locale(locale) == brute_force(d, locale)
+            assert d.choose_locale(locale) == brute_force(d, locale)
+
+        d = LocalesDict()
+
+        for locale in available:
+            d.dict[locale] = {}
+
+        for locale in requested:
+            assert d.choose_locale(locale) == brute_force(d, locale)
+
+        d.dict["de_DE"] = {}
+        assert d.choose_locale("de") == "de_DE"
@@ -1,4 +1,5 @@
 import os
+import sys
 
 import pytest
 
@@ -123,17 +124,23 @@ def test_stack():
     assert stack.has_layer(layers.Text)
     assert not stack.has_layer(fbl.QuickRepliesList)
     assert stack.get_layer(layers.Text) == l1
+    assert stack.find_layer(layers.Text) == l1
+    assert stack.find_layer(fbl.QuickRepliesList) is None
 
     with pytest.raises(KeyError):
         assert stack.get_layer(fbl.QuickRepliesList) is None
 
     stack.layers = [l1, l2, l3]
 
+    assert stack.layers == (l1, l2, l3)
     assert stack.has_layer(fbl.QuickRepliesList)
     assert stack.get_layer(layers.Text) == l1
     assert stack.get_layers(layers.Text) == [l1, l2]
     assert stack.get_layer(fbl.QuickRepliesList) == l3
 
+    stack.get_layers(layers.Text).append(l3)
+    assert stack.get_layers(layers.Text) == [l1, l2]
+
 
 # noinspection PyShadowingNames,PyProtectedMember
 def test_transform_layers(reg):
@@ -147,8 +154,12 @@ def test_transform_layers(reg):
 
         assert layers.RawText in stack._transformed
         assert stack.get_layer(layers.RawText).text == "foo"
+        assert stack.find_layer(layers.RawText).text == "foo"
+        assert stack.find_layer(layers.RawText, False) is None
         assert len(stack.get_layers(layers.Text)) == 1
         assert len(stack.get_layers(layers.RawText)) == 1
+        assert len(stack.get_layers(layers.RawText)) == 1
+        assert len(stack.get_layers(layers.RawText, False)) == 0
 
 
 def test_match_layer():
@@ -159,3 +170,31 @@ def test_match_layer():
     )
 
     s.match_exp("(Text|RawText)+ QuickRepliesList?")
+
+
+def test_postback_interns_action():
+    action = "".join(["say", "_hello"])
+    payload = {"action": action}
+    pb = layers.Postback(payload)
+
+    assert pb.payload == payload
+    assert pb.payload["action"] is sys.intern("say_hello")
+    assert payload["action"] is action
+
+
+# noinspection PyShadowingNames
+def test_custom_attributes(text_request):
+    from bernard.engine.responder import Responder
+
+    objects = [
+        text_request,
+        Responder(None),
+        make_stack(layers.Text("foo")),
+        layers.Text("foo"),
+        fbl.QuickReply("foo"),
+        fbl.QuickRepliesList.TextOption("foo", "Foo"),
+    ]
+
+    for obj in objects:
+        obj.custom = 42
+        assert obj.custom == 42
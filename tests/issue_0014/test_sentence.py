@@ -1,3 +1,7 @@
+from random import SystemRandom
+from unittest.mock import patch
+
+from bernard.conf.utils import patch_conf
 from bernard.i18n.translator import Sentence, SentenceGroup, SortingDict, TransItem
 
 
@@ -16,6 +20,36 @@ def test_sentence():
     assert s.render({}) in ["foo 1", "foo 2"]
 
 
+def test_sentence_best_for_flags():
+    items = [
+        TransItem("FOO", 1, "foo", {}),
+        TransItem("FOO", 1, "foo m", {"gender": "m"}),
+        TransItem("FOO", 1, "foo f", {"gender": "f"}),
+        TransItem("FOO", 1, "foo f 2", {"gender": "f"}),
+        TransItem("FOO", 1, "foo f v", {"gender": "f", "tu": "v"}),
+    ]
+
+    s = Sentence()
+
+    for item in items:
+        s.append(item)
+
+    def best(flags):
+        return sorted(i.value for i in s.best_for_flags(flags))
+
+    assert best({}) == ["foo", "foo f", "foo f 2", "foo f v", "foo m"]
+    assert best({"gender": "m"}) == ["foo m"]
+    assert best({"gender": "f"}) == ["foo f", "foo f 2", "foo f v"]
+    assert best({"gender": "f", "tu": "v"}) == ["foo f v"]
+    assert best({"gender": "x"}) == ["foo", "foo f", "foo f 2", "foo f v", "foo m"]
+
+    new = Sentence()
+    new.append(TransItem("FOO", 1, "new f", {"gender": "f"}))
+    s.update(new, {"gender": "f"})
+
+    assert best({"gender": "f"}) == ["foo f v", "new f"]
+
+
 def test_sentence_group():
     item1 = TransItem("FOO", 1, "foo 1", {})
     item2 = TransItem("FOO", 2, "foo 2", {})
@@ -32,6 +66,18 @@ def test_sentence_group():
     assert sg.render({}) == ["foo 1", "foo 2"]
 
 
+def test_sentence_group_system_random():
+    sg = SentenceGroup()
+    sg.append(TransItem("FOO", 1, "foo 1", {}))
+    sg.append(TransItem("FOO", 1, "foo 2", {}))
+
+    with patch_conf({"I18N_USE_SYSTEM_RANDOM": True}), patch.object(
+        SystemRandom, "choice", side_effect=lambda seq: seq[-1]
+    ) as choice:
+        assert sg.render({}) == ["foo 2"]
+        choice.assert_called_once()
+
+
 def test_sorting_group():
     item1 = TransItem("FOO", 1, "foo 1", {})
     item2 = TransItem("FOO", 2, "foo 2", {})
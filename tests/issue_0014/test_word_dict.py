@@ -1,3 +1,7 @@
+from random import SystemRandom
+
+from bernard.conf.utils import patch_conf
+from bernard.i18n._formatter import I18nFormatter
 from bernard.i18n.translator import SentenceGroup, WordDictionary
 
 
@@ -19,6 +23,9 @@ def test_parse_item():
     assert item.key == "FOO"
     assert item.value == "foo"
 
+    for key in ["FOO+", "FOO+0", "FOO+-1", "FOO+BAR", "FOO+1+2", "FOO+²"]:
+        assert wd.parse_item(key, "foo", {}) is None
+
 
 def test_update_lang():
     wd = WordDictionary()
@@ -70,3 +77,79 @@ def test_get():
     )
 
     assert wd.get("FOO") == ["foo 1", "foo 2"]
+
+
+def test_get_after_update():
+    wd = WordDictionary()
+    wd.update({"fr": [("FOO+2", "bar")]}, {})
+    wd.update({"fr": [("FOO+1", "foo m")]}, {"gender": "m"})
+    wd.update({"fr": [("FOO+1", "foo f")]}, {"gender": "f"})
+
+    assert wd.get("FOO", locale="fr", flags={"gender": "m"}) == ["foo m", "bar"]
+    assert wd.get("FOO", locale="fr", flags={"gender": "f"}) == ["foo f", "bar"]
+
+    wd.update({"fr": [("FOO+1", "new foo f")]}, {"gender": "f"})
+
+    assert wd.get("FOO", locale="fr", flags={"gender": "m"}) == ["foo m", "bar"]
+    assert wd.get("FOO", locale="fr", flags={"gender": "f"}) == ["new foo f", "bar"]
+
+
+def test_get_frozen_flags():
+    wd = WordDictionary()
+    wd.update({"fr": [("FOO", "foo m")]}, {"gender": "m"})
+    wd.update({"fr": [("FOO", "foo f")]}, {"gender": "f"})
+
+    flags = {"gender": "m"}
+    frozen = frozenset(flags.items())
+
+    assert wd.get("FOO", locale="fr", flags=flags, frozen_flags=frozen) == ["foo m"]
+    assert wd.get("FOO", locale="fr", flags={"gender": "f"}) == ["foo f"]
+
+
+def test_system_random():
+    with patch_conf():
+        assert not isinstance(WordDictionary().random, SystemRandom)
+
+    with patch_conf({"I18N_USE_SYSTEM_RANDOM": True}):
+        wd = WordDictionary()
+        assert isinstance(wd.random, SystemRandom)
+
+        wd.update_lang(None, [("FOO", "foo"), ("FOO", "bar")], {})
+        assert wd.get("FOO")[0] in {"foo", "bar"}
+
+
+# noinspection PyProtectedMember
+def test_get_formatted_cache():
+    wd = WordDictionary()
+    wd.update({"en": [("FOO", "{count:number} x {name}")]}, {})
+    f = I18nFormatter("en")
+
+    assert wd.get("FOO", formatter=f, params={"count": 1000, "name": "a"}) == [
+        "1,000 x a"
+    ]
+    assert wd.get("FOO", formatter=f, params={"count": 1000, "name": "a"}) == [
+        "1,000 x a"
+    ]
+    assert wd.get("FOO", formatter=f, params={"count": 1000, "name": "b"}) == [
+        "1,000 x b"
+    ]
+    assert len(wd._formatted) == 2
+
+    class Name:
+        def __format__(self, spec):
+            return "c"
+
+    assert wd.get("FOO", formatter=f, params={"count": 1, "name": Name()}) == ["1 x c"]
+    assert len(wd._formatted) == 2
+
+
+def test_get_formatted_cache_types():
+    wd = WordDictionary()
+    wd.update({"en": [("FOO", "{value}")]}, {})
+    f = I18nFormatter("en")
+
+    assert wd.get("FOO", formatter=f, params={"value": 1}) == ["1"]
+    assert wd.get("FOO", formatter=f, params={"value": 1.0}) == ["1.0"]
+    assert wd.get("FOO", formatter=f, params={"value": True}) == ["True"]
+    assert wd.get("FOO", formatter=f, params={"value": 0}) == ["0"]
+    assert wd.get("FOO", formatter=f, params={"value": False}) == ["False"]
@@ -87,6 +87,21 @@ def test_init():
         assert m.middlewares == [AddOne]
 
 
+def test_implements():
+    conf = {
+        "MIDDLEWARES": [
+            "tests.issue_0029.test_manager.DoNothing",
+            "tests.issue_0029.test_manager.AddOne",
+        ]
+    }
+    with patch_conf(conf):
+        m = MiddlewareManager()
+        m.init()
+
+        assert m.implements("return_n")
+        assert not m.implements("flush")
+
+
 # noinspection PyProtectedMember
 def test_instance():
     MiddlewareManager._instance = None